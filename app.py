@@ -1,36 +1,85 @@
+import time
+# Taken before the heavy imports so the startup report covers them
+launched_at = time.perf_counter()
+
+import asyncio
 import discord
+import importlib
 import os
 from discord.ext import commands
 from dotenv import load_dotenv, find_dotenv
-import logging
+from utils.logs import setup_logging
+from utils.metrics import instrument_http
+from utils.scheduler import WriteScheduler
 load_dotenv(find_dotenv())
-logging.basicConfig(level=logging.INFO)
+setup_logging()
+
+
+def resolve_intents(extensions):
+    """Enable only the gateway intents the extensions declare in their INTENTS tuples.
+
+    Every extension module defines a module-level INTENTS tuple of discord.Intents flag names it
+    relies on (empty if it needs none beyond what others declare); the bot connects with their union.
+    INTENTS_PROFILE=full restores Intents.all() for comparing startup cost against the old behaviour.
+    """
+    if os.environ.get("INTENTS_PROFILE") == "full":
+        return discord.Intents.all()
+    intents = discord.Intents.none()
+    for ext in extensions:
+        for name in getattr(importlib.import_module(ext), "INTENTS", ()):
+            setattr(intents, name, True)
+    return intents
 
 
 class DeerHacks(commands.Bot):
 
     def __init__(self):
-        super().__init__(
-            command_prefix=os.environ["PREFIX"],
-            status=discord.Status.online,
-            activity=discord.Game(name="https://deerhacks.ca"),
-            intents=discord.Intents.all(),
-            help_command=None,
-            case_insensitive=True
-        )
-
         self.initial_extensions = [
             'ext.startup',
             'ext.errors',
             'ext.attendance',
             'ext.sync',
-            'ext.volunteers'
+            'ext.volunteers',
+            'ext.diagnostics',
+            'ext.recorder'
         ]
+        intents = resolve_intents(self.initial_extensions)
+
+        # Every Discord write from the cogs goes through this scheduler
+        writes = WriteScheduler(
+            concurrency=int(os.environ.get("WRITE_CONCURRENCY", "4")),
+            min_interval=float(os.environ.get("WRITE_MIN_INTERVAL", "0"))
+        )
+
+        super().__init__(
+            command_prefix=os.environ["PREFIX"],
+            status=discord.Status.online,
+            activity=discord.Game(name="https://deerhacks.ca"),
+            intents=intents,
+            # Only keep members we have seen; cogs chunk a guild the first time they need every member
+            member_cache_flags=discord.MemberCacheFlags.from_intents(intents),
+            chunk_guilds_at_startup=os.environ.get("INTENTS_PROFILE") == "full",
+            help_command=None,
+            case_insensitive=True,
+            # Raw gateway payloads are only dispatched while ext.recorder is capturing them
+            enable_debug_events=bool(os.environ.get("RECORD_EVENTS_PATH")),
+            http_trace=instrument_http(writes.trace_config())
+        )
+        self.writes = writes
+        self.launched_at = launched_at
 
     async def setup_hook(self):
-        for ext in self.initial_extensions:
-            await self.load_extension(ext)
+        self.writes.start()
+        # ext.startup owns the database pool the other extensions use; the rest are independent
+        first, *rest = self.initial_extensions
+        await self.load_extension(first)
+        await asyncio.gather(*(self.load_extension(ext) for ext in rest))
+
+    async def close(self):
+        await self.writes.stop()
+        await super().close()
 
 
 bot = DeerHacks()
-bot.run(os.environ["TOKEN"])
\ No newline at end of file
+# discord.py logs through the root logger's queue handler instead of installing its own
+bot.run(os.environ["TOKEN"], log_handler=None)
\ No newline at end of file
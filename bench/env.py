@@ -0,0 +1,41 @@
+"""Environment shared by the benchmark and replay tools.
+
+The cogs read role IDs and tuning knobs from the environment, so this has to run before any cog is constructed.
+"""
+import os
+import tempfile
+
+ROLE_IDS = {
+    "pending": 1,
+    "registering": 2,
+    "applied": 3,
+    "selected": 4,
+    "accepted": 5,
+    "attended": 6,
+    "volunteer": 7,
+    "attending": 8,
+    "withdrawn": 9,
+    "mentor": 10,
+}
+
+WORK_DIR = tempfile.mkdtemp(prefix="deerhacks-bench-")
+
+
+def configure():
+    os.environ.update({
+        "PREFIX": "dh.",
+        "PENDING_ROLE_ID": str(ROLE_IDS["pending"]),
+        "REGISTERING_ROLE_ID": str(ROLE_IDS["registering"]),
+        "APPLIED_ROLE_ID": str(ROLE_IDS["applied"]),
+        "SELECTED_ROLE_ID": str(ROLE_IDS["selected"]),
+        "ACCEPTED_ROLE_ID": str(ROLE_IDS["accepted"]),
+        "ATTENDED_ROLE_ID": str(ROLE_IDS["attended"]),
+        "VOLUNTEER_ROLE_ID": str(ROLE_IDS["volunteer"]),
+        "ATTENDING_ROLE_ID": str(ROLE_IDS["attending"]),
+        "WITHDRAWN_ROLE_ID": str(ROLE_IDS["withdrawn"]),
+        "MENTOR_ROLE_ID": str(ROLE_IDS["mentor"]),
+        "AUTO_SYNC": "0",
+        "REACTION_DEBOUNCE_SECONDS": os.environ.get("REACTION_DEBOUNCE_SECONDS", "0.05"),
+        "ATTENDANCE_STATE_DB": os.path.join(WORK_DIR, "attendance_state.db"),
+        "JOBS_DIR": os.path.join(WORK_DIR, "jobs"),
+    })
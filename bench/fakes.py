@@ -0,0 +1,270 @@
+"""In-memory stand-ins for the discord.py objects, database pool and bot the cogs touch.
+
+Every simulated Discord REST call and database query is counted in `Stats`, and REST calls
+can be given a fixed latency so concurrency shows up in wall time.
+"""
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from utils.cache import StatusCache
+from utils.loader import StatusLoader
+from utils.scheduler import WriteScheduler
+
+STATUSES = ("pending", "registering", "applied", "selected", "accepted", "attended")
+
+
+class Stats:
+    def __init__(self):
+        self.api_calls = 0
+        self.db_queries = 0
+        self.api_by_kind = {}
+
+    def api(self, kind):
+        self.api_calls += 1
+        self.api_by_kind[kind] = self.api_by_kind.get(kind, 0) + 1
+
+
+class FakeRole:
+    def __init__(self, guild, role_id, name, default=False):
+        self.guild = guild
+        self.id = role_id
+        self.name = name
+        self.default = default
+
+    def is_default(self):
+        return self.default
+
+    @property
+    def members(self):
+        return [m for m in self.guild.members if m.get_role(self.id) is not None]
+
+    def __eq__(self, other):
+        return getattr(other, "id", None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"<FakeRole {self.name}>"
+
+
+class FakeMember:
+    bot = False
+
+    def __init__(self, guild, member_id, name):
+        self.guild = guild
+        self.id = member_id
+        self.name = name
+        self.discriminator = "0"
+        self.display_name = name
+        self.role_ids = set()
+
+    @property
+    def roles(self):
+        return [self.guild.default_role] + [self.guild.roles_by_id[i] for i in sorted(self.role_ids)]
+
+    def get_role(self, role_id):
+        return self.guild.roles_by_id.get(role_id) if role_id in self.role_ids else None
+
+    async def _call(self, kind):
+        self.guild.stats.api(kind)
+        if self.guild.latency:
+            await asyncio.sleep(self.guild.latency)
+
+    async def edit(self, roles=None, reason=None):
+        await self._call("member.edit")
+        if roles is not None:
+            self.role_ids = {r.id for r in roles if not r.is_default()}
+
+    async def add_roles(self, *roles, reason=None):
+        await self._call("member.add_roles")
+        self.role_ids.update(r.id for r in roles)
+
+    async def remove_roles(self, *roles, reason=None):
+        await self._call("member.remove_roles")
+        self.role_ids.difference_update(r.id for r in roles)
+
+    async def send(self, content=None, embed=None):
+        await self._call("member.send")
+
+    def __str__(self):
+        return self.name
+
+
+class FakeGuild:
+    def __init__(self, guild_id, stats, latency=0.0):
+        self.id = guild_id
+        self.name = "DeerHacks (simulated)"
+        self.stats = stats
+        self.latency = latency
+        self.chunked = True
+        self.members_by_id = {}
+        self.default_role = FakeRole(self, guild_id, "@everyone", default=True)
+        self.roles_by_id = {}
+
+    @property
+    def members(self):
+        return list(self.members_by_id.values())
+
+    def add_role(self, role_id, name):
+        self.roles_by_id[role_id] = FakeRole(self, role_id, name)
+        return self.roles_by_id[role_id]
+
+    def add_member(self, member_id, name):
+        member = self.members_by_id[member_id] = FakeMember(self, member_id, name)
+        return member
+
+    def get_member(self, member_id):
+        return self.members_by_id.get(member_id)
+
+    def get_role(self, role_id):
+        return self.roles_by_id.get(role_id)
+
+    async def chunk(self, cache=True):
+        self.chunked = True
+
+    async def fetch_member(self, member_id):
+        self.stats.api("guild.fetch_member")
+        return self.members_by_id[member_id]
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id):
+        self.channel = channel
+        self.id = message_id
+        self.reactions = []
+        self.attachments = []
+
+    async def remove_reaction(self, emoji, member):
+        self.channel.stats.api("message.remove_reaction")
+
+    async def add_reaction(self, emoji):
+        self.channel.stats.api("message.add_reaction")
+
+    async def edit(self, content=None, **kwargs):
+        self.channel.stats.api("message.edit")
+
+
+class FakeChannel:
+    def __init__(self, channel_id, stats):
+        self.id = channel_id
+        self.stats = stats
+        self.sent = []
+
+    def get_partial_message(self, message_id):
+        return FakeMessage(self, message_id)
+
+    async def fetch_message(self, message_id):
+        self.stats.api("channel.fetch_message")
+        return FakeMessage(self, message_id)
+
+    async def send(self, content=None, embed=None, **kwargs):
+        self.stats.api("channel.send")
+        self.sent.append(content)
+        return FakeMessage(self, random.getrandbits(60))
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def fetch(self, sql, *args):
+        self.pool.stats.db_queries += 1
+        if self.pool.latency:
+            await asyncio.sleep(self.pool.latency)
+        values = args[0] if args else []
+        if "discord_username = ANY" in sql:
+            return [{"discord_username": v} for v in values if v in self.pool.usernames]
+        if "discord_id = ANY" in sql:
+            return [{"discord_id": v, "status": self.pool.users[v]} for v in values if v in self.pool.users]
+        raise NotImplementedError(sql)
+
+    async def fetchrow(self, sql, *args):
+        rows = await self.fetch(sql.replace("= $1", "= ANY($1)"), [args[0]])
+        return rows[0] if rows else None
+
+
+class FakePool:
+    """Answers the users-table queries the bot issues from dicts, with optional per-query latency."""
+
+    def __init__(self, stats, latency=0.0):
+        self.stats = stats
+        self.latency = latency
+        self.users = {}
+        self.usernames = set()
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeConnection(self)
+
+    async def fetch(self, sql, *args):
+        return await FakeConnection(self).fetch(sql, *args)
+
+    async def fetchrow(self, sql, *args):
+        return await FakeConnection(self).fetchrow(sql, *args)
+
+
+class FakeBot:
+    def __init__(self, guild, pool, channel):
+        self.guild = guild
+        self.guilds = [guild]
+        self.db_pool = pool
+        self.channel = channel
+        self.user = SimpleNamespace(id=1, name="deerhacks-bench")
+        self.status_cache = StatusCache()
+        self.status_loader = StatusLoader(pool, cache=self.status_cache)
+        self.writes = WriteScheduler(concurrency=4)
+
+    def get_guild(self, guild_id):
+        return self.guild if guild_id == self.guild.id else None
+
+    def get_channel(self, channel_id):
+        return self.channel
+
+    async def wait_until_ready(self):
+        return
+
+    def dispatch(self, event, *args):
+        return
+
+
+class FakeContext:
+    def __init__(self, bot, guild, author, channel):
+        self.bot = bot
+        self.guild = guild
+        self.author = author
+        self.channel = channel
+        self.message = SimpleNamespace(attachments=[])
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class FakePayload(SimpleNamespace):
+    """Raw reaction event payload."""
+
+
+def build_world(size, role_ids, api_latency=0.0, db_latency=0.0, seed=0):
+    """Create a bot, guild and database with `size` members spread over the dashboard statuses."""
+    rng = random.Random(seed)
+    stats = Stats()
+    guild = FakeGuild(1000, stats, latency=api_latency)
+    for name, role_id in role_ids.items():
+        guild.add_role(role_id, name)
+
+    pool = FakePool(stats, latency=db_latency)
+    for i in range(size):
+        member = guild.add_member(10_000_000_000_000_000 + i, f"member{i}")
+        status = rng.choice(STATUSES)
+        # Most members already hold the right role; the rest are stale
+        if rng.random() < 0.8 and status in role_ids:
+            member.role_ids.add(role_ids[status])
+        if rng.random() < 0.9:
+            pool.users[str(member.id)] = status
+            pool.usernames.add(member.name)
+
+    channel = FakeChannel(2000, stats)
+    bot = FakeBot(guild, pool, channel)
+    return SimpleNamespace(bot=bot, guild=guild, pool=pool, channel=channel, stats=stats, rng=rng)
@@ -0,0 +1,173 @@
+"""Replay a gateway event log captured by ext/recorder.py into the cogs against a stubbed Discord API.
+
+    python -m bench.replay events.jsonl.gz --speed 10 --api-latency 0.05
+
+Reaction events go to the Attendance listeners, member updates to its role tracking, and
+dh.sync DMs to Sync.synchronize. Handlers run as concurrent tasks, as discord.py dispatches
+them, so backlogs build up the way they would in production.
+"""
+import argparse
+import asyncio
+import copy
+import gzip
+import json
+import logging
+import os
+import random
+import time
+
+from dotenv import find_dotenv, load_dotenv
+
+from bench.env import ROLE_IDS, configure
+
+# Recorded member updates carry the production role IDs; map them onto the simulated guild's roles
+load_dotenv(find_dotenv(usecwd=True))
+REAL_ROLE_IDS = {
+    int(os.environ[f"{name.upper()}_ROLE_ID"]): fake_id
+    for name, fake_id in ROLE_IDS.items()
+    if os.environ.get(f"{name.upper()}_ROLE_ID", "").isdigit()
+}
+
+configure()
+
+from bench.fakes import FakePayload, STATUSES, build_world  # noqa: E402
+from ext.attendance import Attendance  # noqa: E402
+from ext.sync import Sync  # noqa: E402
+
+SYNC_COMMANDS = ("sync", "s")
+
+
+def read_log(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def populate(world, events, seed=0):
+    """Add a fake member and users-table row for every user that appears in the log."""
+    rng = random.Random(seed)
+    for _, _, fields in events:
+        user_id = int(fields["user_id"])
+        if world.guild.get_member(user_id) is None:
+            member = world.guild.add_member(user_id, fields.get("username") or f"user{user_id}")
+            status = rng.choice(STATUSES)
+            member.role_ids.add(ROLE_IDS[status])
+            world.pool.users[str(user_id)] = status
+
+
+class Replayer:
+    def __init__(self, world, events, speed, prefix):
+        self.world = world
+        self.events = events
+        self.speed = speed
+        self.prefix = prefix
+        self.attendance = Attendance(world.bot)
+        self.sync = Sync(world.bot)
+        self.in_flight = set()
+        self.backlog_samples = []
+        self.handled = {}
+
+        reaction = next((f for _, e, f in events if e.startswith("MESSAGE_REACTION")), None)
+        if reaction:
+            self.attendance.announcement_msg_id = int(reaction["message_id"])
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    @property
+    def backlog(self):
+        return len(self.in_flight) + self.world.bot.writes.depth + len(self.attendance.pending_reaction_updates)
+
+    def dispatch(self, event, fields):
+        # Every recorded guild is replayed against the one simulated guild
+        guild_id = self.world.guild.id
+        if event in ("MESSAGE_REACTION_ADD", "MESSAGE_REACTION_REMOVE"):
+            payload = FakePayload(
+                message_id=int(fields["message_id"]), user_id=int(fields["user_id"]),
+                channel_id=int(fields["channel_id"]), guild_id=guild_id, emoji=fields["emoji"]
+            )
+            handler = self.attendance.on_raw_reaction_add if event.endswith("ADD") else self.attendance.on_raw_reaction_remove
+            self.spawn(handler(payload))
+        elif event == "GUILD_MEMBER_UPDATE":
+            member = self.world.guild.get_member(int(fields["user_id"]))
+            before = copy.copy(member)
+            before.role_ids = set(member.role_ids)
+            # Only roles this simulated guild knows about
+            member.role_ids = {REAL_ROLE_IDS[int(r)] for r in fields["roles"] if int(r) in REAL_ROLE_IDS}
+            self.spawn(self.attendance.on_member_update(before, member))
+        elif event == "MESSAGE_CREATE":
+            command = fields["content"][len(self.prefix):].split(maxsplit=1)
+            if not command or command[0].lower() not in SYNC_COMMANDS:
+                return
+            member = self.world.guild.get_member(int(fields["user_id"]))
+            self.spawn(self.sync.synchronize(member))
+        else:
+            return
+        self.handled[event] = self.handled.get(event, 0) + 1
+
+    async def sample_backlog(self):
+        while True:
+            self.backlog_samples.append(self.backlog)
+            await asyncio.sleep(0.05)
+
+    async def run(self):
+        sampler = asyncio.create_task(self.sample_backlog())
+        started = time.perf_counter()
+        first = self.events[0][0] if self.events else 0
+        for offset, event, fields in self.events:
+            delay = (offset - first) / 1000 / self.speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.dispatch(event, fields)
+        fed = time.perf_counter() - started
+
+        while self.in_flight or self.attendance.pending_reaction_updates or self.world.bot.writes.depth:
+            await asyncio.gather(*self.in_flight, *self.attendance.pending_reaction_updates.values(),
+                                 return_exceptions=True)
+            await self.world.bot.writes.queue.join()
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        return fed, elapsed
+
+
+async def main_async(args):
+    events = read_log(args.log)
+    world = build_world(0, ROLE_IDS, api_latency=args.api_latency, db_latency=args.db_latency)
+    populate(world, events)
+    world.bot.writes.start()
+    replayer = Replayer(world, events, args.speed, args.prefix)
+    try:
+        fed, elapsed = await replayer.run()
+    finally:
+        await world.bot.writes.stop()
+
+    handled = sum(replayer.handled.values())
+    samples = replayer.backlog_samples or [0]
+    print(f"events in log        {len(events)}")
+    print(f"events handled       {handled} ({', '.join(f'{k}={v}' for k, v in sorted(replayer.handled.items()))})")
+    print(f"replay speed         {args.speed}x, fed in {fed:.2f}s, drained in {elapsed:.2f}s")
+    print(f"throughput           {handled / elapsed if elapsed else 0:.1f} events/s")
+    print(f"backlog              max {max(samples)}, mean {sum(samples) / len(samples):.1f}")
+    print(f"api calls            {world.stats.api_calls} ({world.stats.api_calls / handled if handled else 0:.2f} per event)")
+    for kind, count in sorted(world.stats.api_by_kind.items()):
+        print(f"  {kind:<22} {count}")
+    print(f"db queries           {world.stats.db_queries}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="Event log written by ext/recorder.py (RECORD_EVENTS_PATH)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier, e.g. 1, 10 or 100")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Seconds per stubbed Discord REST call")
+    parser.add_argument("--db-latency", type=float, default=0.002, help="Seconds per simulated database query")
+    parser.add_argument("--prefix", default="dh.", help="Command prefix the log was recorded with")
+    parser.add_argument("--log-level", default="ERROR", help="Log level for the cogs while replaying")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
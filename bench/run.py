@@ -0,0 +1,165 @@
+"""Offline benchmarks for the cogs against a simulated guild and database.
+
+    python -m bench.run --sizes 1000 10000 50000 --api-latency 0.002
+
+Each scenario reports wall time, simulated Discord API calls, database queries and the
+peak Python memory allocated while it ran.
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import time
+import tracemalloc
+
+from bench.env import ROLE_IDS, configure
+
+configure()
+
+from bench.fakes import FakeContext, FakePayload, build_world  # noqa: E402
+from ext.attendance import Attendance  # noqa: E402
+from ext.sync import Sync  # noqa: E402
+from ext.volunteers import Volunteers  # noqa: E402
+from utils.roster import Roster  # noqa: E402
+
+ANNOUNCEMENT_ID = 3000
+
+
+async def drain(bot):
+    while bot.writes.depth:
+        await asyncio.sleep(0.01)
+    await bot.writes.queue.join()
+
+
+async def scenario_reminders(world):
+    cog = Attendance(world.bot)
+    cog.announcement_msg_id = ANNOUNCEMENT_ID
+    await cog.check_attendance_reminder()
+
+
+async def scenario_reactions(world):
+    cog = Attendance(world.bot)
+    cog.announcement_msg_id = ANNOUNCEMENT_ID
+    members = world.guild.members
+    rush = members[: len(members) // 2]
+
+    def payload(member, emoji):
+        return FakePayload(
+            message_id=ANNOUNCEMENT_ID, user_id=member.id, guild_id=world.guild.id,
+            channel_id=world.channel.id, emoji=emoji
+        )
+
+    for member in rush:
+        await cog.on_raw_reaction_add(payload(member, "✅"))
+    # A tenth of the rush changes their mind a few times within the debounce window
+    for member in rush[::10]:
+        await cog.on_raw_reaction_add(payload(member, "❌"))
+        await cog.on_raw_reaction_remove(payload(member, "✅"))
+        await cog.on_raw_reaction_add(payload(member, "✅"))
+        await cog.on_raw_reaction_remove(payload(member, "❌"))
+
+    while cog.pending_reaction_updates:
+        await asyncio.gather(*cog.pending_reaction_updates.values(), return_exceptions=True)
+    await drain(world.bot)
+
+
+async def scenario_sync_spike(world):
+    cog = Sync(world.bot)
+    # Everyone DMs dh.sync at once
+    await asyncio.gather(*(cog.synchronize(member) for member in world.guild.members))
+
+
+async def scenario_volunteers(world):
+    cog = Volunteers(world.bot)
+    members = world.guild.members
+    cog.roster = Roster(
+        volunteers=[m.name for m in members[::20]] + [f"missing{i}" for i in range(len(members) // 200)],
+        mentors=[m.name for m in members[5::40]]
+    )
+    author = members[0]
+    ctx = FakeContext(world.bot, world.guild, author, world.channel)
+    await Volunteers.volunteers.callback(cog, ctx)
+
+
+async def scenario_bulk_roles(world):
+    cog = Volunteers(world.bot)
+    members = world.guild.members
+    cog.roster = Roster(volunteers=[m.name for m in members[::5]], mentors=[m.name for m in members[3::25]])
+    # Some volunteers were already given their role by hand
+    for member in members[::50]:
+        member.role_ids.add(ROLE_IDS["volunteer"])
+    ctx = FakeContext(world.bot, world.guild, members[0], world.channel)
+    await Volunteers.help_saurabh.callback(cog, ctx)
+
+
+async def scenario_csv_sync(world):
+    cog = Sync(world.bot)
+    # The command only reads host files from the jobs directory
+    jobs_dir = os.environ["JOBS_DIR"]
+    os.makedirs(jobs_dir, exist_ok=True)
+    path = os.path.join(jobs_dir, f"members-{len(world.guild.members)}.csv")
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["discord_id"])
+        for member in world.guild.members:
+            writer.writerow([member.id])
+    ctx = FakeContext(world.bot, world.guild, world.guild.members[0], world.channel)
+    await Sync.adminsynccsv.callback(cog, ctx, os.path.basename(path))
+
+
+SCENARIOS = {
+    "reminders": scenario_reminders,
+    "reactions": scenario_reactions,
+    "sync_spike": scenario_sync_spike,
+    "volunteers": scenario_volunteers,
+    "bulk_roles": scenario_bulk_roles,
+    "csv_sync": scenario_csv_sync,
+}
+
+
+async def run_scenario(name, size, args):
+    world = build_world(size, ROLE_IDS, api_latency=args.api_latency, db_latency=args.db_latency)
+    world.bot.writes.start()
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        await SCENARIOS[name](world)
+        await drain(world.bot)
+    finally:
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        await world.bot.writes.stop()
+    return {
+        "scenario": name,
+        "members": size,
+        "wall_s": elapsed,
+        "api_calls": world.stats.api_calls,
+        "db_queries": world.stats.db_queries,
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Seconds per simulated Discord REST call")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Seconds per simulated database query")
+    parser.add_argument("--log-level", default="ERROR", help="Log level for the cogs while benchmarking")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    print(f"{'scenario':<12} {'members':>8} {'wall_s':>9} {'api_calls':>10} {'db_queries':>11} {'peak_mb':>8}")
+    for name in args.scenarios:
+        for size in args.sizes:
+            result = asyncio.run(run_scenario(name, size, args))
+            print(
+                f"{result['scenario']:<12} {result['members']:>8} {result['wall_s']:>9.3f} "
+                f"{result['api_calls']:>10} {result['db_queries']:>11} {result['peak_mb']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,20 @@
 from discord.ext import tasks 
 import os
+import heapq
+import asyncio
 import discord
 from discord.ext import commands
 import logging
 from datetime import datetime, timedelta
+from utils.store import StateStore
+from utils.scheduler import Priority
+from utils.members import ensure_chunked, get_or_fetch_member
+from utils.metrics import reaction_queue_depth, reminder_loop_duration
 
 logger = logging.getLogger(__name__)
 
+INTENTS = ("guilds", "members", "guild_reactions", "guild_messages", "message_content")
+
 class Attendance(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -16,7 +24,7 @@ class Attendance(commands.Cog):
         if announcement_msg_id:
             try:
                 self.announcement_msg_id = int(announcement_msg_id)
-                logger.debug(f"Loaded announcement message ID: {self.announcement_msg_id}")
+                logger.debug("Loaded announcement message ID: %s", self.announcement_msg_id)
             except ValueError:
                 logger.error("ANNOUNCEMENT_MSG_ID is not a valid integer. Using None instead.")
 
@@ -27,48 +35,302 @@ class Attendance(commands.Cog):
         
         # Store last reminder times for users
         self.last_reminder = {}
-        
+        self.reminder_interval = timedelta(hours=4)
+
+        # Min-heap of (due_time, member_id, guild_id) for members still pending a response.
+        # reminder_due holds each member's live due time; heap entries that disagree with it are stale.
+        self.reminder_heap = []
+        self.reminder_due = {}
+        self.reminders_seeded = False
+
+        # guild_id -> {"attending" | "withdrawn" | "pending": member IDs}, kept current from role and
+        # reaction events so counts never need a member scan; verify_counts corrects any drift
+        self.counts = {}
+
+        # user_id -> emojis that user currently has on the announcement
+        self.reactions = {}
+        self.announcement_channel_id = None
+        # Users whose reactions changed while seed_reactions was paging through the announcement;
+        # None when no seed is running
+        self.seed_touched = None
+
+        # Reaction toggles are coalesced per user and applied once the window closes
+        self.reaction_debounce = float(os.environ.get("REACTION_DEBOUNCE_SECONDS", "2"))
+        self.pending_reaction_updates = {}
+        reaction_queue_depth.callback = lambda: len(self.pending_reaction_updates)
+
+        # Reminder times, the announcement and reactions survive restarts in a local SQLite file
+        self.store = StateStore(os.environ.get("ATTENDANCE_STATE_DB", "attendance_state.db"))
+        self.check_attendance_reminder.change_interval(minutes=int(os.environ.get("REMINDER_TICK_MINUTES", "5")))
+        self.flush_state.change_interval(seconds=int(os.environ.get("ATTENDANCE_FLUSH_SECONDS", "10")))
+        self.verify_counts.change_interval(minutes=int(os.environ.get("ATTENDANCE_VERIFY_MINUTES", "30")))
+
+    async def cog_load(self):
+        state = await asyncio.to_thread(self.store.load)
+
+        if self.announcement_msg_id is None and state["state"].get("announcement_msg_id"):
+            self.announcement_msg_id = int(state["state"]["announcement_msg_id"])
+            logger.debug("Restored announcement message ID: %s", self.announcement_msg_id)
+
+        channel_id = os.environ.get("ANNOUNCEMENT_CHANNEL_ID") or state["state"].get("announcement_channel_id")
+        if channel_id:
+            self.announcement_channel_id = int(channel_id)
+        self.reactions = state["reactions"]
+
+        for member_id, (guild_id, last_reminded, due) in state["reminders"].items():
+            if last_reminded:
+                self.last_reminder[member_id] = last_reminded
+            if due and guild_id:
+                self.reminder_due[member_id] = due
+                heapq.heappush(self.reminder_heap, (due, member_id, guild_id))
+
+        # Stored due times are kept; the first scan only adds and drops members whose roles
+        # changed while the bot was offline
+        logger.info("Restored %s scheduled reminders from %s", len(self.reminder_due), self.store.path)
+
         # Start the reminder loop
         self.check_attendance_reminder.start()
+        self.flush_state.start()
+        self.verify_counts.start()
+        self.seed_task = asyncio.create_task(self.seed_reactions())
 
-    def cog_unload(self):
+    async def cog_unload(self):
         self.check_attendance_reminder.cancel()
+        self.flush_state.cancel()
+        self.verify_counts.cancel()
+        self.seed_task.cancel()
+        for task in self.pending_reaction_updates.values():
+            task.cancel()
+        await self.store.flush()
 
-    @tasks.loop(hours=4)
-    async def check_attendance_reminder(self):
-        """Check for users who need attendance reminders every 4 hours."""
-        if not self.announcement_msg_id:
+    async def seed_reactions(self):
+        """Read the announcement's reactions once so the in-memory map includes changes made while offline."""
+        await self.bot.wait_until_ready()
+        if self.announcement_msg_id is None or self.announcement_channel_id is None:
+            return
+
+        try:
+            channel = self.bot.get_channel(self.announcement_channel_id)
+            message = await channel.fetch_message(self.announcement_msg_id)
+        except discord.NotFound:
+            logger.warning("Announcement %s no longer exists, clearing it", self.announcement_msg_id)
+            await self.clear_announcement()
+            return
+        except Exception as e:
+            logger.error("Error seeding announcement reactions, using stored state: %s", e)
             return
 
+        self.seed_touched = set()
+        try:
+            reactions = {}
+            for reaction in message.reactions:
+                async for user in reaction.users():
+                    if user.id != self.bot.user.id:
+                        reactions.setdefault(user.id, set()).add(str(reaction.emoji))
+        except Exception as e:
+            logger.error("Error seeding announcement reactions, using stored state: %s", e)
+            return
+        finally:
+            touched, self.seed_touched = self.seed_touched, None
+
+        # Merge into the live map; users whose reactions changed while paging already have
+        # newer state from their events than the page they were read on
+        merged = 0
+        for user_id in (self.reactions.keys() | reactions.keys()) - touched:
+            seeded = reactions.get(user_id, set())
+            current = self.reactions.get(user_id, set())
+            if seeded == current:
+                continue
+            for emoji in current - seeded:
+                self.store.remove_reaction(user_id, emoji)
+            for emoji in seeded - current:
+                self.store.add_reaction(user_id, emoji)
+            if seeded:
+                self.reactions[user_id] = seeded
+            else:
+                self.reactions.pop(user_id, None)
+            merged += 1
+        logger.info(
+            "Seeded reactions for %s users from the announcement, %s changed while offline",
+            len(reactions), merged
+        )
+
+    @tasks.loop(seconds=10)
+    async def flush_state(self):
+        try:
+            await self.store.flush()
+        except Exception as e:
+            logger.error("Error writing attendance state: %s", e)
+
+    def is_pending(self, member):
+        """Accepted but has neither confirmed nor withdrawn."""
+        return (
+            member.get_role(self.accepted_role_id) is not None
+            and member.get_role(self.attending_role_id) is None
+            and member.get_role(self.withdrawn_role_id) is None
+        )
+
+    def categories(self, member):
+        return {
+            "attending": member.get_role(self.attending_role_id) is not None,
+            "withdrawn": member.get_role(self.withdrawn_role_id) is not None,
+            "pending": self.is_pending(member),
+        }
+
+    def track(self, member):
+        """Move a member into the counter sets matching their current roles."""
+        counts = self.counts.get(member.guild.id)
+        if counts is None:
+            return
+        for category, present in self.categories(member).items():
+            if present:
+                counts[category].add(member.id)
+            else:
+                counts[category].discard(member.id)
+
+    def untrack(self, guild_id, member_id):
+        for members in self.counts.get(guild_id, {}).values():
+            members.discard(member_id)
+
+    def count_guild(self, guild):
+        """Full scan of the attendance roles; returns fresh counter sets for the guild."""
+        counts = {"attending": set(), "withdrawn": set(), "pending": set()}
+        for role_id, category in ((self.attending_role_id, "attending"), (self.withdrawn_role_id, "withdrawn")):
+            role = guild.get_role(role_id)
+            if role:
+                counts[category].update(m.id for m in role.members)
+        accepted_role = guild.get_role(self.accepted_role_id)
+        if accepted_role:
+            counts["pending"].update(m.id for m in accepted_role.members if self.is_pending(m))
+        return counts
+
+    def schedule_reminder(self, member, due=None):
+        if due is None:
+            last_reminded = self.last_reminder.get(member.id)
+            due = last_reminded + self.reminder_interval if last_reminded else datetime.now()
+        self.reminder_due[member.id] = due
+        heapq.heappush(self.reminder_heap, (due, member.id, member.guild.id))
+        self.store.put_reminder(member.id, member.guild.id, self.last_reminder.get(member.id), due)
+
+    def unschedule_reminder(self, member_id):
+        # The heap entry is discarded lazily when it reaches the top
+        if self.reminder_due.pop(member_id, None) is not None:
+            self.store.put_reminder(member_id, None, self.last_reminder.get(member_id), None)
+
+    def seed_reminders(self):
+        """One-time scan of accepted members to reconcile the heap; role events keep it current afterwards."""
         for guild in self.bot.guilds:
             accepted_role = guild.get_role(self.accepted_role_id)
             attending_role = guild.get_role(self.attending_role_id)
             withdrawn_role = guild.get_role(self.withdrawn_role_id)
 
             if not all([accepted_role, attending_role, withdrawn_role]):
-                logger.error(f"Could not find all required roles in guild {guild.name}")
+                logger.error("Could not find all required roles in guild %s", guild.name)
+                continue
+
+            # The same scan seeds the counters
+            self.counts[guild.id] = self.count_guild(guild)
+            self.reconcile_reminders(guild, self.counts[guild.id]["pending"])
+        self.reminders_seeded = True
+        logger.info("Scheduled attendance reminders for %s pending members", len(self.reminder_due))
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if before.roles == after.roles:
+            return
+        self.track(after)
+        if self.is_pending(after):
+            if after.id not in self.reminder_due:
+                self.schedule_reminder(after)
+        else:
+            self.unschedule_reminder(after.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.untrack(member.guild.id, member.id)
+        self.unschedule_reminder(member.id)
+
+    @tasks.loop(minutes=30)
+    async def verify_counts(self):
+        """Recount from the member cache and correct the incremental counters if they drifted.
+
+        Guilds that have not been chunked yet are skipped; nothing has needed their members.
+        """
+        for guild in self.bot.guilds:
+            if not guild.chunked:
+                continue
+            actual = self.count_guild(guild)
+            tracked = self.counts.get(guild.id)
+            if tracked is not None and tracked != actual:
+                logger.warning(
+                    "Attendance counters drifted in %s: tracked %s, actual %s",
+                    guild.name,
+                    {k: len(v) for k, v in tracked.items()},
+                    {k: len(v) for k, v in actual.items()}
+                )
+            self.counts[guild.id] = actual
+            self.reconcile_reminders(guild, actual["pending"])
+
+    def reconcile_reminders(self, guild, pending):
+        """Make the reminder schedule match the guild's pending members from a full scan."""
+        for member_id in pending:
+            if member_id not in self.reminder_due:
+                self.schedule_reminder(guild.get_member(member_id))
+        for member_id in list(self.reminder_due):
+            # Members who left are dropped when their heap entry comes due
+            if member_id not in pending and guild.get_member(member_id) is not None:
+                self.unschedule_reminder(member_id)
+
+    @verify_counts.before_loop
+    async def before_verify_counts(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(minutes=5)
+    async def check_attendance_reminder(self):
+        """Send reminders to pending members whose next reminder is due."""
+        with reminder_loop_duration.time():
+            await self.send_due_reminders()
+
+    async def send_due_reminders(self):
+        # Reminders only go out for an active announcement, so guilds are not chunked before then
+        if not self.announcement_msg_id:
+            return
+
+        # Due members are looked up in the member cache, restored schedule or not
+        for guild in self.bot.guilds:
+            await ensure_chunked(guild)
+        if not self.reminders_seeded:
+            self.seed_reminders()
+
+        current_time = datetime.now()
+        due_members = []
+        while self.reminder_heap and self.reminder_heap[0][0] <= current_time:
+            due, member_id, guild_id = heapq.heappop(self.reminder_heap)
+            if self.reminder_due.get(member_id) != due:
                 continue
 
-            for member in accepted_role.members:
-                # Skip if they already confirmed or withdrew
-                if attending_role in member.roles or withdrawn_role in member.roles:
-                    continue
-
-                # Check if we should send a reminder (if 4 hours have passed since last reminder)
-
-                current_time = datetime.now()
-                last_reminded = self.last_reminder.get(member.id)
-                
-                # If no previous reminder or 4 hours have passed since last reminder
-                if last_reminded is None or (current_time - last_reminded >= timedelta(hours=4)):
-                    try:
-                        await self.send_reminder(member)
-                        self.last_reminder[member.id] = datetime.now()
-                        logger.debug(f"Sent reminder to {member.display_name}")
-                    except discord.Forbidden:
-                        logger.error(f"Cannot send DM to {member.display_name}")
-                    except Exception as e:
-                        logger.error(f"Error sending reminder to {member.display_name}: {e}")
+            guild = self.bot.get_guild(guild_id)
+            member = guild.get_member(member_id) if guild else None
+            if member is None or not self.is_pending(member):
+                self.unschedule_reminder(member_id)
+                continue
+            due_members.append(member)
+
+        results = await asyncio.gather(*(
+            self.bot.writes.submit(Priority.REMINDER, self.send_reminder, member) for member in due_members
+        ), return_exceptions=True)
+
+        for member, result in zip(due_members, results):
+            if isinstance(result, discord.Forbidden):
+                logger.error("Cannot send DM to %s", member.display_name)
+            elif isinstance(result, Exception):
+                logger.error("Error sending reminder to %s: %s", member.display_name, result)
+            else:
+                self.last_reminder[member.id] = datetime.now()
+                logger.debug("Sent reminder to %s", member.display_name)
+
+            # Reminded or not, try again after another interval
+            self.schedule_reminder(member, due=current_time + self.reminder_interval)
 
     async def send_reminder(self, member):
         """Send a reminder DM to a member."""
@@ -91,17 +353,35 @@ class Attendance(commands.Cog):
         """Wait until the bot is ready before starting the reminder loop."""
         await self.bot.wait_until_ready()
 
-    @commands.command(name="announce", help="Make an attendance announcement")
+    async def clear_announcement(self):
+        """Forget the active announcement and its reactions so a new one can be made."""
+        self.announcement_msg_id = None
+        self.announcement_channel_id = None
+        self.reactions = {}
+        for task in self.pending_reaction_updates.values():
+            task.cancel()
+        self.store.put_value("announcement_msg_id", None)
+        self.store.put_value("announcement_channel_id", None)
+        self.store.clear_reactions()
+        await self.store.flush()
+
+    @commands.command(name="announce", help="Make an attendance announcement, or 'announce reset' to forget the current one")
     @commands.has_permissions(manage_messages=True)
-    async def announce(self, ctx):
+    async def announce(self, ctx, action: str = None):
         """
         Sends an announcement embed with two reaction options:
           - ✅: Confirm attendance (adds the 'attending' role)
           - ❌: Withdraw attendance (adds the 'withdrawn' role)
         If an announcement is already active (message ID loaded), the command does nothing.
+        `announce reset` forgets the active announcement so the next event can post its own.
         """
+        if action == "reset":
+            await self.clear_announcement()
+            await ctx.send("Announcement cleared. Run the command again to post a new one.")
+            return
+
         if self.announcement_msg_id:
-            await ctx.send("An announcement is already active.")
+            await ctx.send("An announcement is already active. Use `announce reset` to replace it.")
             return
 
         embed = discord.Embed(
@@ -119,12 +399,90 @@ class Attendance(commands.Cog):
         )
         message = await ctx.send(embed=embed)
         self.announcement_msg_id = message.id
+        self.announcement_channel_id = message.channel.id
+        self.reactions = {}
+        self.store.put_value("announcement_msg_id", message.id)
+        self.store.put_value("announcement_channel_id", message.channel.id)
+        self.store.clear_reactions()
+        await self.store.flush()
 
         # Add reactions
         await message.add_reaction("✅")
         await message.add_reaction("❌")
         await ctx.send("Announcement sent and reactions added.")
 
+    @commands.command(name="attendance_stats", aliases=["astats"], help="Show live attendance counts")
+    @commands.has_permissions(manage_messages=True)
+    async def attendance_stats(self, ctx):
+        """Reads the incrementally maintained counters; only the first call in a guild walks the member list."""
+        if ctx.guild is None:
+            await ctx.send("This command can only be run in a server.")
+            return
+        counts = self.counts.get(ctx.guild.id)
+        if counts is None:
+            await ensure_chunked(ctx.guild)
+            counts = self.counts[ctx.guild.id] = self.count_guild(ctx.guild)
+
+        lines = [
+            f"Attending: {len(counts['attending'])}",
+            f"Withdrawn: {len(counts['withdrawn'])}",
+            f"Pending: {len(counts['pending'])}",
+            f"Role updates in flight: {len(self.pending_reaction_updates)}",
+        ]
+        await ctx.send("\n".join(lines))
+
+    async def apply_reaction_roles(self, guild_id, user_id):
+        """Wait out the debounce window, then make the member's roles match their current reactions."""
+        try:
+            await asyncio.sleep(self.reaction_debounce)
+        finally:
+            self.pending_reaction_updates.pop(user_id, None)
+
+        guild = self.bot.get_guild(guild_id)
+        member = await get_or_fetch_member(guild, user_id) if guild else None
+        if member is None:
+            return
+
+        try:
+            member = await self.bot.writes.submit(Priority.REACTION, self.edit_reaction_roles, member)
+            # Count the change now rather than waiting for the member update to come back over the gateway
+            self.track(member)
+        except discord.Forbidden:
+            logger.error("Permission error updating roles for %s", member.display_name)
+        except discord.HTTPException as e:
+            logger.error("HTTP error when updating roles for %s: %s", member.display_name, e)
+
+    async def edit_reaction_roles(self, member):
+        """Set the attending/withdrawn roles from the member's reactions, keeping their other roles.
+
+        Runs inside the write scheduler, so roles and reactions are read when the edit is sent and
+        role changes made while it was queued are not overwritten. Returns the updated member.
+        """
+        emojis = self.reactions.get(member.id, set())
+        wanted = {
+            self.attending_role_id: "✅" in emojis,
+            self.withdrawn_role_id: "❌" in emojis,
+        }
+        roles = [r for r in member.roles if not r.is_default() and r.id not in wanted]
+        for role_id, present in wanted.items():
+            role = member.guild.get_role(role_id)
+            if present and role:
+                roles.append(role)
+
+        if {r.id for r in roles} == {r.id for r in member.roles if not r.is_default()}:
+            return member
+
+        updated = await member.edit(roles=roles, reason=f"Attendance reaction ({''.join(sorted(emojis)) or 'none'})")
+        logger.debug("Updated attendance roles for %s", member.display_name)
+        return updated or member
+
+    def queue_reaction_update(self, guild_id, user_id):
+        # Further toggles inside the window are absorbed; the task reads the final reaction state
+        if user_id not in self.pending_reaction_updates:
+            self.pending_reaction_updates[user_id] = asyncio.create_task(
+                self.apply_reaction_roles(guild_id, user_id)
+            )
+
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload):
         # Process only reactions on the designated announcement message.
@@ -134,91 +492,47 @@ class Attendance(commands.Cog):
         if payload.user_id == self.bot.user.id:
             return
 
-        guild = self.bot.get_guild(payload.guild_id)
-        if guild is None:
-            return
+        emoji = str(payload.emoji)
+        if self.seed_touched is not None:
+            self.seed_touched.add(payload.user_id)
+        user_reactions = self.reactions.setdefault(payload.user_id, set())
+        conflicting = user_reactions - {emoji}
+        user_reactions.add(emoji)
+        self.store.add_reaction(payload.user_id, emoji)
+        if emoji in ("✅", "❌"):
+            self.queue_reaction_update(payload.guild_id, payload.user_id)
 
-        member = guild.get_member(payload.user_id)
-        if member is None:
+        # Ensure only one reaction is active. The removal event updates the map.
+        if not conflicting:
             return
-
-        emoji = str(payload.emoji)
-        if emoji == "✅":
-            role = guild.get_role(self.attending_role_id)
-            if role:
-                try:
-                    await member.add_roles(role, reason="Attendance confirmed")
-                    logger.debug(f"Added attending role to {member.display_name}")
-                except discord.Forbidden:
-                    logger.error(f"Permission error adding role to {member.display_name}")
-                except discord.HTTPException as e:
-                    logger.error(f"HTTP error when adding role to {member.display_name}: {e}")
-                    
-        elif emoji == "❌":
-            role = guild.get_role(self.withdrawn_role_id)
-            if role:
-                try:
-                    await member.add_roles(role, reason="Attendance withdrawn")
-                    logger.debug(f"Added withdrawn role to {member.display_name}")
-                except discord.Forbidden:
-                    logger.error(f"Permission error adding role to {member.display_name}")
-                except discord.HTTPException as e:
-                    logger.error(f"HTTP error when adding role to {member.display_name}: {e}")
-
-        # Ensure only one reaction is active.
-        try:
-            channel = self.bot.get_channel(payload.channel_id)
-            if channel is None:
-                return
-            message = await channel.fetch_message(payload.message_id)
-        except Exception as e:
-            logger.error(f"Error fetching message: {e}")
+        channel = self.bot.get_channel(payload.channel_id)
+        if channel is None:
             return
-
-        for reaction in message.reactions:
-            if str(reaction.emoji) != emoji:
-                users = [user async for user in reaction.users()]
-                if any(user.id == payload.user_id for user in users):
-                    try:
-                        await message.remove_reaction(reaction.emoji, discord.Object(id=payload.user_id))
-                        logger.debug(f"Removed conflicting reaction {reaction.emoji} from user {payload.user_id}")
-                    except Exception as e:
-                        logger.error(f"Error removing reaction: {e}")
+        message = channel.get_partial_message(payload.message_id)
+        for other in conflicting:
+            try:
+                await self.bot.writes.submit(
+                    Priority.REACTION, message.remove_reaction, other, discord.Object(id=payload.user_id)
+                )
+                logger.debug("Removed conflicting reaction %s from user %s", other, payload.user_id)
+            except Exception as e:
+                logger.error("Error removing reaction: %s", e)
 
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload):
         if self.announcement_msg_id is None or payload.message_id != self.announcement_msg_id:
             return
 
-        guild = self.bot.get_guild(payload.guild_id)
-        if guild is None:
-            return
-
-        member = guild.get_member(payload.user_id)
-        if member is None:
+        if payload.user_id == self.bot.user.id:
             return
 
         emoji = str(payload.emoji)
-        if emoji == "✅":
-            role = guild.get_role(self.attending_role_id)
-            if role:
-                try:
-                    await member.remove_roles(role, reason="Attendance reaction removed (✅)")
-                    logger.debug(f"Removed attending role from {member.display_name}")
-                except discord.Forbidden:
-                    logger.error(f"Permission error removing role from {member.display_name}")
-                except discord.HTTPException as e:
-                    logger.error(f"HTTP error when removing role from {member.display_name}: {e}")
-        elif emoji == "❌":
-            role = guild.get_role(self.withdrawn_role_id)
-            if role:
-                try:
-                    await member.remove_roles(role, reason="Attendance reaction removed (❌)")
-                    logger.debug(f"Removed withdrawn role from {member.display_name}")
-                except discord.Forbidden:
-                    logger.error(f"Permission error removing role from {member.display_name}")
-                except discord.HTTPException as e:
-                    logger.error(f"HTTP error when removing role from {member.display_name}: {e}")
+        if self.seed_touched is not None:
+            self.seed_touched.add(payload.user_id)
+        self.reactions.get(payload.user_id, set()).discard(emoji)
+        self.store.remove_reaction(payload.user_id, emoji)
+        if emoji in ("✅", "❌"):
+            self.queue_reaction_update(payload.guild_id, payload.user_id)
 
 async def setup(bot):
     await bot.add_cog(Attendance(bot))
@@ -0,0 +1,119 @@
+from discord.ext import commands, tasks
+import asyncio
+import cProfile
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from utils.metrics import loop_lag
+
+logger = logging.getLogger(__name__)
+
+INTENTS = ()
+
+
+def frame_stack(frame):
+    """Root-first list of "function (file:line)" entries for a frame."""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return stack[::-1]
+
+
+class Diagnostics(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.lag_interval = float(os.environ.get("LOOP_LAG_INTERVAL", "0.5"))
+        self.lag_threshold = float(os.environ.get("LOOP_LAG_THRESHOLD", "0.25"))
+        self.profile_dir = os.environ.get("PROFILE_DIR", "profiles")
+
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.watchdog_stop = threading.Event()
+        self.watchdog = threading.Thread(target=self.watch_loop, name="loop-watchdog", daemon=True)
+
+        self.measure_lag.change_interval(seconds=self.lag_interval)
+
+    async def cog_load(self):
+        self.heartbeat = time.monotonic()
+        self.measure_lag.start()
+        self.watchdog.start()
+
+    async def cog_unload(self):
+        self.measure_lag.cancel()
+        self.watchdog_stop.set()
+
+    @tasks.loop(seconds=0.5)
+    async def measure_lag(self):
+        now = time.monotonic()
+        # Iterations are lag_interval apart; anything beyond that is time the loop spent busy elsewhere
+        lag = max(0.0, now - self.heartbeat - self.lag_interval)
+        self.heartbeat = now
+        loop_lag.set(lag)
+        if lag > self.lag_threshold:
+            logger.warning("Event loop lagged %.3fs", lag)
+
+    def watch_loop(self):
+        """Runs on its own thread: if the loop misses heartbeats, log what the loop thread is executing."""
+        reported = None
+        while not self.watchdog_stop.wait(self.lag_threshold / 2):
+            heartbeat = self.heartbeat
+            stalled = time.monotonic() - heartbeat - self.lag_interval
+            if stalled < self.lag_threshold or reported == heartbeat:
+                continue
+            reported = heartbeat
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            logger.warning(
+                "Event loop blocked for %.2fs, currently in:\n%s", stalled, "".join(traceback.format_stack(frame))
+            )
+
+    @commands.is_owner()
+    @commands.command(name="profile", description="Profile the bot for N seconds. Mode 'sample' writes folded stacks for flamegraphs, 'cprofile' a pstats dump")
+    async def profile(self, ctx, seconds: float = 10.0, mode: str = "sample"):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        await ctx.send(f"Profiling for {seconds:.0f}s ({mode})...")
+
+        if mode == "cprofile":
+            # cProfile only sees the thread that enabled it, which is the event loop thread here
+            path = os.path.join(self.profile_dir, f"profile-{stamp}.prof")
+            profiler = cProfile.Profile()
+            profiler.enable()
+            await asyncio.sleep(seconds)
+            profiler.disable()
+            await asyncio.to_thread(profiler.dump_stats, path)
+        else:
+            path = os.path.join(self.profile_dir, f"profile-{stamp}.folded")
+            stacks = await asyncio.to_thread(self.sample_loop_thread, seconds)
+            await asyncio.to_thread(self.write_folded, path, stacks)
+
+        await ctx.send(f"Profile written to `{path}`")
+
+    def sample_loop_thread(self, seconds, interval=0.005):
+        """Sample the event loop thread's stack every `interval` seconds from a worker thread."""
+        stacks = collections.Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is not None:
+                stacks[";".join(frame_stack(frame))] += 1
+            time.sleep(interval)
+        return stacks
+
+    @staticmethod
+    def write_folded(path, stacks):
+        # Brendan Gregg's folded format, readable by flamegraph.pl and speedscope
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+async def setup(bot):
+    await bot.add_cog(Diagnostics(bot))
@@ -1,7 +1,10 @@
 import discord
 from discord.ext import commands
-import sys
-import traceback
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTENTS = ()
 
 class Errors(commands.Cog):
 
@@ -33,8 +36,7 @@ class Errors(commands.Cog):
             await ctx.channel.send("This command can only be used in private messages", delete_after=10)
 
         else:
-            print('Ignoring exception in command {}:'.format(ctx.command), file=sys.stderr)
-            traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+            logger.error("Ignoring exception in command %s", ctx.command, exc_info=error)
 
 
 #Setup
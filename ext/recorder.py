@@ -0,0 +1,103 @@
+from discord.ext import commands, tasks
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+INTENTS = ()
+
+RECORDED_EVENTS = {"MESSAGE_REACTION_ADD", "MESSAGE_REACTION_REMOVE", "GUILD_MEMBER_UPDATE", "MESSAGE_CREATE"}
+
+
+def compact(event, data, prefix):
+    """Keep only the fields the replayer needs, or None to skip the event."""
+    if event in ("MESSAGE_REACTION_ADD", "MESSAGE_REACTION_REMOVE"):
+        emoji = data.get("emoji") or {}
+        return {
+            "user_id": data["user_id"],
+            "message_id": data["message_id"],
+            "channel_id": data["channel_id"],
+            "guild_id": data.get("guild_id"),
+            "emoji": emoji.get("name") if not emoji.get("id") else f"<:{emoji.get('name')}:{emoji['id']}>",
+        }
+    if event == "GUILD_MEMBER_UPDATE":
+        return {
+            "user_id": data["user"]["id"],
+            "username": data["user"].get("username"),
+            "guild_id": data["guild_id"],
+            "roles": data.get("roles", []),
+        }
+    if event == "MESSAGE_CREATE":
+        content = data.get("content") or ""
+        if not content.lower().startswith(prefix.lower()):
+            return None
+        return {
+            "user_id": data["author"]["id"],
+            "channel_id": data["channel_id"],
+            "guild_id": data.get("guild_id"),
+            "content": content,
+        }
+    return None
+
+
+class Recorder(commands.Cog):
+    """Appends selected raw gateway events to a gzipped JSON-lines log for bench/replay.py.
+
+    Enabled by RECORD_EVENTS_PATH; each line is [milliseconds since recording started, event type, fields].
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.path = os.environ.get("RECORD_EVENTS_PATH")
+        self.prefix = os.environ.get("PREFIX", "dh.")
+        self.started = time.monotonic()
+        self.buffer = []
+        self.file = None
+
+    async def cog_load(self):
+        if not self.path:
+            return
+        self.file = await asyncio.to_thread(gzip.open, self.path, "at", encoding="utf-8")
+        self.flush_events.start()
+        logger.info("Recording gateway events to %s", self.path)
+
+    async def cog_unload(self):
+        if self.file is None:
+            return
+        self.flush_events.cancel()
+        await self.write_buffer()
+        await asyncio.to_thread(self.file.close)
+
+    @commands.Cog.listener()
+    async def on_socket_raw_receive(self, message):
+        if self.file is None or not isinstance(message, str):
+            return
+        # Cheap substring check before parsing; most gateway traffic is not recorded
+        if not any(event in message for event in RECORDED_EVENTS):
+            return
+        payload = json.loads(message)
+        event = payload.get("t")
+        if event not in RECORDED_EVENTS:
+            return
+        fields = compact(event, payload.get("d") or {}, self.prefix)
+        if fields is not None:
+            self.buffer.append([round((time.monotonic() - self.started) * 1000), event, fields])
+
+    async def write_buffer(self):
+        if not self.buffer:
+            return
+        lines, self.buffer = self.buffer, []
+        data = "".join(json.dumps(line, separators=(",", ":")) + "\n" for line in lines)
+        await asyncio.to_thread(self.file.write, data)
+
+    @tasks.loop(seconds=1)
+    async def flush_events(self):
+        await self.write_buffer()
+
+
+async def setup(bot):
+    await bot.add_cog(Recorder(bot))
@@ -1,27 +1,218 @@
-from discord.ext import commands
+from discord.ext import commands, tasks
+from aiohttp import web
+import asyncio
 import asyncpg
+import json
+import logging
 import os
+import resource
+import time
+from utils.breaker import CircuitBreaker
+from utils.cache import StatusCache
+from utils.snapshot import StatusSnapshot
+from utils.loader import StatusLoader, STATUS_QUERY, USERNAME_QUERY
+from utils.metrics import REGISTRY, command_latency, write_queue_depth
+
+logger = logging.getLogger(__name__)
+
+INTENTS = ("guilds",)
+
+# Hot statements, parsed on every new pool connection so the first requests after a restart
+# hit asyncpg's statement cache instead of paying for parse/plan on the request path
+WARM_QUERIES = (STATUS_QUERY, USERNAME_QUERY)
+
+
+async def warm_connection(connection):
+    for query in WARM_QUERIES:
+        await connection.fetch(query, [])
 
 
 class Startup(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.listen_connection = None
+        self.listen_task = None
+        self.status_channel = os.environ.get("STATUS_NOTIFY_CHANNEL", "user_status")
+        self.reported_startup = False
+        self.metrics_runner = None
+
+    def db_config(self):
+        return {
+            "user": os.environ["DB_USER"],
+            "password": os.environ["DB_PASS"],
+            "database": os.environ["DB_NAME"],
+            "host": os.environ["DB_HOST"]
+        }
 
     async def cog_load(self):
+        started = time.perf_counter()
         self.bot.db_pool = await asyncpg.create_pool(
-            user=os.environ["DB_USER"],
-            password=os.environ["DB_PASS"],
-            database=os.environ["DB_NAME"],
-            host=os.environ["DB_HOST"],
-            min_size=1,  # Minimum number of connections in the pool
-            max_size=10  # Maximum number of connections in the pool
+            **self.db_config(),
+            # min_size connections are opened (and warmed) before the bot connects to the gateway
+            min_size=int(os.environ.get("DB_POOL_MIN_SIZE", "5")),
+            max_size=int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+            timeout=float(os.environ.get("DB_CONNECT_TIMEOUT", "10")),
+            command_timeout=float(os.environ.get("DB_COMMAND_TIMEOUT", "10")),
+            max_inactive_connection_lifetime=float(os.environ.get("DB_POOL_IDLE_LIFETIME", "300")),
+            init=warm_connection
+        )
+        logger.info("Database pool ready with %d warm connections in %.2fs",
+                    self.bot.db_pool.get_size(), time.perf_counter() - started)
+        # Statuses change a few times per event, so lookups are served from a shared cache
+        # that the DeerHacks API invalidates through NOTIFY on STATUS_NOTIFY_CHANNEL
+        self.bot.status_cache = StatusCache(
+            maxsize=int(os.environ.get("STATUS_CACHE_SIZE", "20000")),
+            ttl=float(os.environ.get("STATUS_CACHE_TTL", "300")),
+            miss_ttl=float(os.environ.get("STATUS_CACHE_MISS_TTL", "10"))
         )
+        # Users-table reads fail fast when Postgres is struggling and fall back to a local snapshot
+        self.db_breaker = CircuitBreaker(
+            "users table",
+            failure_threshold=int(os.environ.get("DB_BREAKER_FAILURES", "3")),
+            reset_timeout=float(os.environ.get("DB_BREAKER_RESET", "30")),
+            call_timeout=float(os.environ.get("DB_READ_TIMEOUT", "2"))
+        )
+        self.snapshot = StatusSnapshot(
+            os.environ.get("STATUS_SNAPSHOT_DB", "status_snapshot.db"),
+            updated_column=os.environ.get("SNAPSHOT_UPDATED_COLUMN", "updated_at")
+        )
+        # Concurrent status lookups are batched into one query per few milliseconds
+        self.bot.status_loader = StatusLoader(
+            self.bot.db_pool,
+            cache=self.bot.status_cache,
+            breaker=self.db_breaker,
+            snapshot=self.snapshot,
+            window=float(os.environ.get("STATUS_BATCH_WINDOW_MS", "5")) / 1000
+        )
+        self.listen_task = asyncio.create_task(self.listen_for_status_changes())
+        self.refresh_snapshot.change_interval(seconds=float(os.environ.get("SNAPSHOT_REFRESH_SECONDS", "60")))
+        self.refresh_snapshot.start()
+        await self.start_metrics_server()
+
+    async def cog_unload(self):
+        self.refresh_snapshot.cancel()
+        if self.metrics_runner:
+            await self.metrics_runner.cleanup()
+        if self.listen_task:
+            self.listen_task.cancel()
+        if self.listen_connection and not self.listen_connection.is_closed():
+            await self.listen_connection.close()
+
+    async def start_metrics_server(self):
+        """Serve Prometheus text metrics on METRICS_HOST:METRICS_PORT (METRICS_PORT=0 disables it)."""
+        port = int(os.environ.get("METRICS_PORT", "9108"))
+        if not port:
+            return
+        write_queue_depth.callback = lambda: self.bot.writes.depth
+
+        async def metrics(request):
+            return web.Response(text=REGISTRY.render(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, os.environ.get("METRICS_HOST", "127.0.0.1"), port).start()
+        except OSError as e:
+            # Metrics are optional; a taken port or bad host must not keep the bot from starting
+            logger.error("Could not serve metrics on port %s: %s", port, e)
+            await runner.cleanup()
+            return
+        self.metrics_runner = runner
+        logger.info("Serving metrics on port %s", port)
+
+    @commands.Cog.listener()
+    async def on_command(self, ctx):
+        ctx.started_at = time.perf_counter()
+
+    def observe_command(self, ctx, outcome):
+        started = getattr(ctx, "started_at", None)
+        if started is not None and ctx.command is not None:
+            command_latency.observe(time.perf_counter() - started, ctx.command.qualified_name, outcome)
+
+    @commands.Cog.listener()
+    async def on_command_completion(self, ctx):
+        self.observe_command(ctx, "ok")
+
+    @commands.Cog.listener()
+    async def on_command_error(self, ctx, error):
+        self.observe_command(ctx, "error")
+
+    async def copy_changed_users(self):
+        async with self.bot.db_pool.acquire() as connection:
+            return await self.snapshot.refresh(connection)
+
+    @tasks.loop(seconds=60)
+    async def refresh_snapshot(self):
+        if self.db_breaker.state == "open":
+            return
+        try:
+            # The first refresh copies the whole table, so it gets longer than a normal read
+            count = await asyncio.wait_for(self.copy_changed_users(), 60)
+            logger.debug("Status snapshot refreshed with %s changed users", count)
+        except Exception as e:
+            logger.error("Status snapshot refresh failed: %s", e)
+
+    def on_status_notification(self, connection, pid, channel, payload):
+        """Payload is either a bare discord_id or JSON with a discord_id key."""
+        try:
+            discord_id = str(json.loads(payload)["discord_id"])
+        except (ValueError, TypeError, KeyError):
+            discord_id = payload.strip()
+        self.bot.status_cache.invalidate(discord_id)
+        logger.debug("Invalidated cached status for %s", discord_id)
+        self.bot.dispatch("user_status_change", discord_id)
+
+    async def listen_for_status_changes(self):
+        """Hold a dedicated LISTEN connection, reconnecting whenever it drops."""
+        while True:
+            try:
+                self.listen_connection = await asyncpg.connect(**self.db_config())
+                closed = asyncio.Event()
+                self.listen_connection.add_termination_listener(lambda connection: closed.set())
+                await self.listen_connection.add_listener(self.status_channel, self.on_status_notification)
+                # Notifications may have been missed while disconnected
+                self.bot.status_cache.clear()
+                logger.info("Listening for status changes on %s", self.status_channel)
+                await closed.wait()
+                logger.warning("Status change listener disconnected, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Status change listener failed: %s", e)
+            await asyncio.sleep(5)
+
+    @staticmethod
+    def resident_memory_mb():
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if peak > 1 << 24 else peak / 1024
 
     @commands.Cog.listener()
     async def on_ready(self):
-        print(f'Logged in as {self.bot.user.name} | {self.bot.user.id}')
+        logger.info("Logged in as %s | %s", self.bot.user.name, self.bot.user.id)
+        if self.reported_startup:
+            return
+        self.reported_startup = True
+        enabled = [name for name, value in self.bot.intents if value]
+        # Taken at ready, before any cog chunks a guild on demand (an active attendance announcement
+        # does so on the first reminder tick), so chunked guilds are listed to keep runs comparable
+        logger.info(
+            "Startup report: ready in %.2fs, RSS %.1f MB, %d members cached, %d/%d guilds chunked, profile %s, intents: %s",
+            time.perf_counter() - self.bot.launched_at, self.resident_memory_mb(),
+            sum(len(g.members) for g in self.bot.guilds), sum(g.chunked for g in self.bot.guilds), len(self.bot.guilds),
+            os.environ.get("INTENTS_PROFILE", "lean"), ", ".join(enabled)
+        )
 
 
 async def setup(bot):
-    await bot.add_cog(Startup(bot))
\ No newline at end of file
+    await bot.add_cog(Startup(bot))
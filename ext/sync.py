@@ -1,16 +1,74 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import logging
 import os
+import asyncio
+import csv
+import hashlib
+import io
+import itertools
+import json
+import time
+from utils.checkpoint import Checkpoint
+from utils.formatting import paginate
+from utils.loader import StaleStatusError
+from utils.members import ensure_chunked, get_or_fetch_member
+from utils.scheduler import Priority
 
 logger = logging.getLogger(__name__)
 
+INTENTS = ("guilds", "members", "guild_messages", "dm_messages", "message_content")
+
+EXPORT_QUERY = "SELECT discord_id, status FROM users WHERE discord_id IS NOT NULL"
+EXPORT_FIELDS = ("discord_id", "name", "problem", "status", "expected_role", "current_roles")
+
+
+def read_file(path, limit):
+    """Read at most `limit` bytes; returns None if the file is larger."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size > limit:
+            return None
+        return f.read()
+
+
+def write_rows(f, rows, fmt):
+    if fmt == "csv":
+        csv.writer(f).writerows([row[k] for k in EXPORT_FIELDS] for row in rows)
+    else:
+        f.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+    f.flush()
+
+
 class Sync(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    async def synchronize(self, member) -> str:
-        roles = {
+        # discord_ids whose dashboard status changed, waiting for the next auto sync pass
+        self.pending_sync = set()
+        self.auto_sync_enabled = os.environ.get("AUTO_SYNC", "1") != "0"
+        # CSV sync jobs checkpoint their progress here so an interrupted run can resume
+        self.jobs_dir = os.environ.get("JOBS_DIR", "jobs")
+        self.csv_batch_size = int(os.environ.get("SYNC_BATCH_SIZE", "500"))
+        self.csv_max_bytes = int(os.environ.get("SYNC_CSV_MAX_BYTES", str(20 * 1024 * 1024)))
+        self.export_batch_size = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+
+        # Role IDs are read from the environment once; they are checked for every member in bulk runs
+        self.status_role_ids = self.status_roles()
+        # A member holds one of these at a time. The volunteer role is also handed out by
+        # help_saurabh regardless of dashboard status, so it is only ever added, never stripped.
+        self.exclusive_role_ids = frozenset(
+            role_id for status, role_id in self.status_role_ids.items() if status != "volunteer"
+        )
+
+        self.auto_sync.change_interval(seconds=float(os.environ.get("AUTO_SYNC_INTERVAL", "2")))
+        if self.auto_sync_enabled:
+            self.auto_sync.start()
+
+    def cog_unload(self):
+        self.auto_sync.cancel()
+
+    def status_roles(self):
+        return {
             "pending": int(os.environ["PENDING_ROLE_ID"]),
             "registering": int(os.environ["REGISTERING_ROLE_ID"]),
             "applied": int(os.environ["APPLIED_ROLE_ID"]),
@@ -20,49 +78,141 @@ class Sync(commands.Cog):
             "volunteer": int(os.environ["VOLUNTEER_ROLE_ID"])
         }
 
-        # Make sure your bot instance has an attribute `db_pool`
-        async with self.bot.db_pool.acquire() as connection:
-            user = await connection.fetchrow(
-                "SELECT status FROM users WHERE discord_id = $1", str(member.id)
-            )
+    def has_status_role(self, member, role) -> bool:
+        """Whether the member holds `role` and no other status role; unrelated roles are ignored."""
+        current = {r.id for r in member.roles if r.id in self.exclusive_role_ids}
+        return member.get_role(role.id) is not None and current <= {role.id}
+
+    async def apply_status_role(self, member, role):
+        """Swap the member's status role for `role`, keeping every other role.
+
+        Runs inside the write scheduler, so the role list is read when the edit is actually sent
+        and changes made while it was queued are kept.
+        """
+        if self.has_status_role(member, role):
+            return
+        exclusive = self.exclusive_role_ids
+        roles = [r for r in member.roles if not r.is_default() and r.id not in exclusive and r.id != role.id]
+        await member.edit(roles=roles + [role])
+
+    async def synchronize(self, member, priority=Priority.INTERACTIVE) -> str:
+        roles = self.status_role_ids
+
+        # Make sure your bot instance has an attribute `status_loader`
+        status = await self.bot.status_loader.load(member.id)
 
-        if user:
-            logger.debug(f"Fetched user status from DB: {user}")
+        if status:
+            logger.debug("Fetched user status from DB: %s", status)
         else:
-            logger.warning(f"No user found in DB for {member.id}")
+            logger.warning("No user found in DB for %s", member.id)
             return "Failed to synchronize: User not found in DB"
 
-        if user['status'] in roles:
-            role_id = roles[user['status']]
+        if status in roles:
+            role_id = roles[status]
             role = member.guild.get_role(role_id)
 
             if role:
-                logger.debug(f"Assigning role {role.name} ({role.id}) to {member.name} ({member.id})")
+                if self.has_status_role(member, role):
+                    logger.debug("%s already has role %s, skipping edit", member.name, role.name)
+                    return f"Successfully synchronized role {role.name} for {member.name}"
+
+                logger.debug("Assigning role %s (%s) to %s (%s)", role.name, role.id, member.name, member.id)
                 try:
-                    await member.edit(roles=[role])
-                    logger.debug(f"Successfully assigned role {role.name} to {member.name}")
+                    await self.bot.writes.submit(priority, self.apply_status_role, member, role)
+                    logger.debug("Successfully assigned role %s to %s", role.name, member.name)
                     return f"Successfully synchronized role {role.name} for {member.name}"
                 except discord.Forbidden:
-                    logger.error(f"Permission issue: Cannot edit roles for {member.name}")
+                    logger.error("Permission issue: Cannot edit roles for %s", member.name)
                     return "Failed to synchronize due to insufficient permissions"
                 except discord.HTTPException as e:
-                    logger.error(f"HTTPException: {e}")
+                    logger.error("HTTPException: %s", e)
                     return "Failed to synchronize due to an API error"
             else:
-                logger.warning(f"Role {role_id} not found in guild")
+                logger.warning("Role %s not found in guild", role_id)
                 return "Failed to synchronize due to missing role"
 
         return "Failed to synchronize: Unknown issue"
 
+    async def plan_reconcile(self, guild, members=None):
+        """Return (member, role) pairs for every member whose status role differs from their DB status.
+
+        Raises StaleStatusError while Postgres is unavailable; snapshot statuses may be older than
+        the roles members already have, so they are never written back.
+        """
+        roles = self.status_role_ids
+        if members is None:
+            members = guild.members
+        members = {str(m.id): m for m in members if not m.bot}
+
+        statuses = await self.bot.status_loader.load_many(members, fresh_only=True)
+
+        plan = []
+        for discord_id, status in statuses.items():
+            member = members[discord_id]
+            role = guild.get_role(roles.get(status, 0))
+            if role is None:
+                continue
+            if not self.has_status_role(member, role):
+                plan.append((member, role))
+        return plan
+
+    async def apply_plan(self, plan, priority=Priority.BULK):
+        """Run the role edits from plan_reconcile concurrently and return how many failed."""
+        results = await asyncio.gather(*(
+            self.bot.writes.submit(priority, self.apply_status_role, member, role) for member, role in plan
+        ), return_exceptions=True)
+        failed = 0
+        for (member, _), result in zip(plan, results):
+            if isinstance(result, Exception):
+                logger.error("Failed to reconcile %s (%s): %s", member.name, member.id, result)
+                failed += 1
+        return failed
+
+    @commands.Cog.listener()
+    async def on_user_status_change(self, discord_id):
+        if self.auto_sync_enabled:
+            self.pending_sync.add(discord_id)
+
+    @tasks.loop(seconds=2)
+    async def auto_sync(self):
+        """Apply roles for every member whose status changed since the last pass, as one batch."""
+        if not self.pending_sync:
+            return
+        discord_ids, self.pending_sync = self.pending_sync, set()
+
+        for guild in self.bot.guilds:
+            await ensure_chunked(guild)
+            members = [m for m in (guild.get_member(int(i)) for i in discord_ids if i.isdigit()) if m is not None]
+            if not members:
+                continue
+            try:
+                plan = await self.plan_reconcile(guild, members)
+                failed = await self.apply_plan(plan)
+            except StaleStatusError as e:
+                # Retry on a later pass once fresh statuses can be read
+                self.pending_sync.update(e.discord_ids)
+                logger.warning("Auto sync in %s deferred: %s", guild.name, e)
+                continue
+            except Exception as e:
+                logger.error("Auto sync of %s members in %s failed: %s", len(members), guild.name, e)
+                continue
+            logger.info("Auto synced %s/%s changed members in %s", len(plan) - failed, len(members), guild.name)
+
+    @auto_sync.before_loop
+    async def before_auto_sync(self):
+        await self.bot.wait_until_ready()
+
     @commands.dm_only()
     @commands.cooldown(2, 7200, commands.BucketType.user)
     @commands.command(name="sync", description="Sync dashboard status with your discord role", aliases=['s'])
     async def sync(self, ctx):
-        if ctx.author.mutual_guilds:
-            guild = ctx.author.mutual_guilds[0]
-            member = guild.get_member(ctx.author.id)
-            message = await self.synchronize(member)
-            await ctx.send(message)
+        # Members aren't chunked at startup, so the author may not be cached yet
+        for guild in self.bot.guilds:
+            member = await get_or_fetch_member(guild, ctx.author.id)
+            if member:
+                message = await self.synchronize(member)
+                await ctx.send(message)
+                return
 
     @commands.guild_only()
     @commands.has_permissions(manage_roles=True)
@@ -71,5 +221,228 @@ class Sync(commands.Cog):
         message = await self.synchronize(member)
         await ctx.channel.send(message)
 
+    @commands.guild_only()
+    @commands.has_permissions(manage_roles=True)
+    @commands.command(name="adminreconcile", description="Sync every member whose roles differ from their dashboard status. Pass 'dry' to only show the plan", aliases=['ar'])
+    async def adminreconcile(self, ctx, mode: str = None):
+        dry_run = mode in ("dry", "dry-run", "--dry-run")
+        await ensure_chunked(ctx.guild)
+        try:
+            plan = await self.plan_reconcile(ctx.guild)
+        except StaleStatusError:
+            await ctx.channel.send("The dashboard database is unavailable, try again later.")
+            return
+
+        if not plan:
+            await ctx.channel.send("All members already match their dashboard status.")
+            return
+
+        if dry_run:
+            lines = [
+                f"{member} ({member.id}): {', '.join(r.name for r in member.roles if not r.is_default()) or '-'} -> {role.name}"
+                for member, role in plan
+            ]
+            for page in paginate(lines, header=f"Planned role changes ({len(plan)} members)\n"):
+                await ctx.channel.send(page)
+            return
+
+        await ctx.channel.send(f"Reconciling {len(plan)} members...")
+        failed = await self.apply_plan(plan)
+        await ctx.channel.send(f"Reconciled {len(plan) - failed} members, {failed} failed.")
+
+    @commands.guild_only()
+    @commands.has_permissions(manage_roles=True)
+    @commands.command(name="adminsynccsv", description="Sync roles for every discord_id in an attached CSV (or a file in the bot's jobs directory). Re-running the same file resumes where it stopped", aliases=['acsv'])
+    async def adminsynccsv(self, ctx, path: str = None):
+        limit_mb = self.csv_max_bytes / (1024 * 1024)
+        if ctx.message.attachments:
+            attachment = ctx.message.attachments[0]
+            if attachment.size > self.csv_max_bytes:
+                await ctx.channel.send(f"The attached file is larger than {limit_mb:.0f} MB.")
+                return
+            data = await attachment.read()
+        elif path:
+            # Only files placed in the jobs directory can be read from the host
+            jobs_dir = os.path.realpath(self.jobs_dir)
+            resolved = os.path.realpath(os.path.join(jobs_dir, path))
+            if os.path.commonpath([jobs_dir, resolved]) != jobs_dir or not os.path.isfile(resolved):
+                await ctx.channel.send(f"{path} is not a file in the bot's jobs directory.")
+                return
+            try:
+                data = await asyncio.to_thread(read_file, resolved, self.csv_max_bytes)
+            except OSError as e:
+                await ctx.channel.send(f"Could not read {path}: {e}")
+                return
+            if data is None:
+                await ctx.channel.send(f"{path} is larger than {limit_mb:.0f} MB.")
+                return
+        else:
+            await ctx.channel.send("Attach a CSV with a discord_id column, or pass the name of a file in the jobs directory.")
+            return
+
+        try:
+            text = data.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            await ctx.channel.send("The CSV must be UTF-8 encoded.")
+            return
+
+        # The job is identified by the file's contents, so the same CSV resumes from its checkpoint
+        job_id = hashlib.sha1(data).hexdigest()[:16]
+        checkpoint = Checkpoint(os.path.join(self.jobs_dir, f"csv-sync-{job_id}.json"))
+        state = await checkpoint.load() or {
+            "rows_done": 0, "synced": 0, "unchanged": 0, "missing_member": 0, "missing_status": 0, "failed": 0
+        }
+        if state["rows_done"]:
+            await ctx.channel.send(f"Resuming CSV sync {job_id} at row {state['rows_done']}...")
+        else:
+            await ctx.channel.send(f"Starting CSV sync {job_id}...")
+
+        await ensure_chunked(ctx.guild)
+        reader = csv.DictReader(io.StringIO(text))
+        rows = itertools.islice(reader, state["rows_done"], None)
+        started = time.perf_counter()
+        processed = 0
+
+        while chunk := list(itertools.islice(rows, self.csv_batch_size)):
+            members = []
+            missing_member = 0
+            for row in chunk:
+                discord_id = (row.get("discord_id") or "").strip()
+                if not discord_id:
+                    continue
+                member = ctx.guild.get_member(int(discord_id)) if discord_id.isdigit() else None
+                if member is None:
+                    missing_member += 1
+                else:
+                    members.append(member)
+
+            # One batched lookup per chunk; plan_reconcile then reads the same statuses from the cache
+            try:
+                statuses = await self.bot.status_loader.load_many((m.id for m in members), fresh_only=True)
+                plan = await self.plan_reconcile(ctx.guild, members)
+            except StaleStatusError:
+                # The checkpoint stops before this chunk, so a re-run picks it up
+                await ctx.channel.send(
+                    f"CSV sync {job_id} paused at row {state['rows_done']}: the dashboard database is unavailable. "
+                    "Run the command again with the same file to resume."
+                )
+                return
+            failed = await self.apply_plan(plan)
+
+            state["missing_member"] += missing_member
+            state["missing_status"] += len(members) - len(statuses)
+            state["unchanged"] += len(statuses) - len(plan)
+            state["synced"] += len(plan) - failed
+            state["failed"] += failed
+            state["rows_done"] += len(chunk)
+            processed += len(chunk)
+            await checkpoint.save(state)
+
+        elapsed = time.perf_counter() - started
+        await checkpoint.clear()
+        await ctx.channel.send(
+            f"CSV sync {job_id} finished: {state['rows_done']} rows ({processed / elapsed if elapsed else 0:.1f} rows/s this run), "
+            f"{state['synced']} synced, {state['unchanged']} already correct, {state['missing_member']} not in server, "
+            f"{state['missing_status']} not in DB, {state['failed']} failed."
+        )
+
+    def mismatch(self, guild, roles, discord_id, status, member):
+        """Describe how a users row and its guild member disagree, or None if they match."""
+        role = guild.get_role(roles.get(status, 0))
+        row = {
+            "discord_id": discord_id,
+            "name": str(member) if member else "",
+            "problem": None,
+            "status": status or "",
+            "expected_role": role.name if role else "",
+            "current_roles": ";".join(r.name for r in member.roles if not r.is_default()) if member else "",
+        }
+        if member is None:
+            row["problem"] = "not_in_server"
+        elif status is None:
+            row["problem"] = "not_in_db"
+        elif role is None:
+            row["problem"] = "unknown_status"
+        elif not self.has_status_role(member, role):
+            row["problem"] = "role_mismatch"
+        else:
+            return None
+        return row
+
+    async def export_mismatches(self, guild, f, fmt):
+        """Stream the users table through a server-side cursor and write every mismatch to `f`.
+
+        Rows are fetched `export_batch_size` at a time, so memory stays flat however large the
+        table is; only the set of guild members not yet seen in the table is held throughout.
+        Returns a count per problem.
+        """
+        roles = self.status_role_ids
+        unseen = {m.id for m in guild.members if not m.bot}
+        counts = {"rows": 0}
+
+        async def emit(rows):
+            for row in rows:
+                counts[row["problem"]] = counts.get(row["problem"], 0) + 1
+            if rows:
+                await asyncio.to_thread(write_rows, f, rows, fmt)
+
+        async with self.bot.db_pool.acquire() as connection:
+            # Server-side cursors only live inside a transaction
+            async with connection.transaction(readonly=True):
+                cursor = await connection.cursor(EXPORT_QUERY)
+                while batch := await cursor.fetch(self.export_batch_size):
+                    rows = []
+                    for record in batch:
+                        discord_id = record["discord_id"]
+                        member = guild.get_member(int(discord_id)) if discord_id.isdigit() else None
+                        if member is not None:
+                            unseen.discard(member.id)
+                        row = self.mismatch(guild, roles, discord_id, record["status"], member)
+                        if row is not None:
+                            rows.append(row)
+                    counts["rows"] += len(batch)
+                    await emit(rows)
+
+        unseen = iter(unseen)
+        while chunk := list(itertools.islice(unseen, self.export_batch_size)):
+            await emit([self.mismatch(guild, roles, str(i), None, guild.get_member(i)) for i in chunk])
+        return counts
+
+    @commands.guild_only()
+    @commands.has_permissions(manage_roles=True)
+    @commands.command(name="adminexport", description="Export every mismatch between server roles and dashboard statuses as csv (default) or jsonl", aliases=['ae'])
+    async def adminexport(self, ctx, fmt: str = "csv"):
+        fmt = fmt.lower()
+        if fmt not in ("csv", "jsonl"):
+            await ctx.channel.send("Format must be csv or jsonl.")
+            return
+
+        await ensure_chunked(ctx.guild)
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = os.path.join(self.jobs_dir, f"mismatches-{ctx.guild.id}-{int(time.time())}.{fmt}")
+        await ctx.channel.send("Exporting role/status mismatches...")
+
+        started = time.perf_counter()
+        f = await asyncio.to_thread(open, path, "w", newline="", encoding="utf-8")
+        try:
+            if fmt == "csv":
+                await asyncio.to_thread(csv.writer(f).writerow, EXPORT_FIELDS)
+            counts = await self.export_mismatches(ctx.guild, f, fmt)
+        except Exception as e:
+            logger.error("Mismatch export for %s failed: %s", ctx.guild.name, e)
+            await ctx.channel.send(f"Export failed: {e}")
+            return
+        finally:
+            await asyncio.to_thread(f.close)
+
+        elapsed = time.perf_counter() - started
+        rows = counts.pop("rows")
+        summary = ", ".join(f"{count} {problem}" for problem, count in sorted(counts.items())) or "no mismatches"
+        message = f"Scanned {rows} users in {elapsed:.1f}s: {summary}. Written to {path}"
+        if os.path.getsize(path) <= ctx.guild.filesize_limit:
+            await ctx.channel.send(message, file=discord.File(path))
+        else:
+            await ctx.channel.send(message)
+
 async def setup(bot):
     await bot.add_cog(Sync(bot))
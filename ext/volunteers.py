@@ -1,29 +1,98 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import logging
-import json
 import os
 import asyncio
+import time
+from utils.checkpoint import Checkpoint
+from utils.members import MemberIndex, ensure_chunked
+from utils.roster import Roster
+from utils.formatting import paginate
+from utils.scheduler import Priority
 
 logger = logging.getLogger(__name__)
 
+INTENTS = ("guilds", "members", "guild_messages", "message_content")
+
 class Volunteers(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-        # Load volunteers and mentors from a JSON file.
-        config_file = os.environ.get("VOLUNTEERS_CONFIG", "volunteers.json")
+        # Volunteers and mentors from a JSON file, reloaded whenever the file changes
+        self.config_file = os.environ.get("VOLUNTEERS_CONFIG", "volunteers.json")
+        self.roster = Roster()
+        self.watch_roster.change_interval(seconds=float(os.environ.get("ROSTER_POLL_SECONDS", "5")))
+
+        # help_saurabh assigns roles in batches and checkpoints after each one
+        self.jobs_dir = os.environ.get("JOBS_DIR", "jobs")
+        self.bulk_batch_size = int(os.environ.get("BULK_ROLE_BATCH_SIZE", "50"))
+        self.progress_interval = float(os.environ.get("BULK_PROGRESS_SECONDS", "3"))
+
+        # Per-guild username lookup, built on first use and kept current by the member listeners
+        self.member_indexes = {}
+
+    async def cog_load(self):
+        await self.reload_roster()
+        self.watch_roster.start()
+
+    def cog_unload(self):
+        self.watch_roster.cancel()
+
+    async def reload_roster(self):
         try:
-            with open(config_file, "r") as f:
-                config = json.load(f)
-                self.volunteers = config.get("volunteers", [])
-                self.mentors = config.get("mentors", [])
-            logger.info("Loaded volunteers and mentors from %s", config_file)
+            self.roster = await asyncio.to_thread(Roster.load, self.config_file)
+            logger.info(
+                "Loaded %d volunteers and %d mentors from %s",
+                len(self.roster.volunteers), len(self.roster.mentors), self.config_file
+            )
         except Exception as e:
-            logger.error("Error loading config file (%s): %s", config_file, e)
-            # If loading fails, fallback to empty lists (or you can choose to raise an error)
-            self.volunteers = []
-            self.mentors = []
+            # Keep serving the last good roster; a half-saved file is retried on the next poll
+            logger.error("Error loading config file (%s): %s", self.config_file, e)
+
+    @tasks.loop(seconds=5)
+    async def watch_roster(self):
+        try:
+            mtime = await asyncio.to_thread(os.path.getmtime, self.config_file)
+        except OSError:
+            return
+        if mtime != self.roster.mtime:
+            await self.reload_roster()
+
+    async def member_index(self, guild):
+        index = self.member_indexes.get(guild.id)
+        if index is None:
+            await ensure_chunked(guild)
+            index = self.member_indexes[guild.id] = MemberIndex(guild.members)
+            logger.info("Built member index for %s (%d members)", guild.name, len(guild.members))
+        return index
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        index = self.member_indexes.get(member.guild.id)
+        if index:
+            index.add(member)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        index = self.member_indexes.get(member.guild.id)
+        if index:
+            index.remove(member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        index = self.member_indexes.get(after.guild.id)
+        if index:
+            index.update(before, after)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before, after):
+        # Username changes arrive as user updates rather than member updates
+        for guild in self.bot.guilds:
+            index = self.member_indexes.get(guild.id)
+            member = guild.get_member(after.id)
+            if index and member:
+                index.remove(before)
+                index.add(member)
 
     @commands.command(name="henrik_curious_about_volunteers", help="Show status for volunteers and mentors.")
     async def volunteers(self, ctx):
@@ -34,83 +103,81 @@ class Volunteers(commands.Cog):
             await ctx.send("This command can only be run in a server.")
             return
 
-        volunteer_table = []
-        mentor_table = []
-
-        # Helper function: Try to find a member in the guild by username.
+        # Try to find a member in the guild by username, falling back to the closest near miss.
         # If full_match is True, we compare using "name#discriminator".
-        def find_member(name, full_match=False):
-            for member in guild.members:
-                if full_match:
-                    if f"{member.name}#{member.discriminator}" == name:
-                        return member
-                else:
-                    if member.name == name:
-                        return member
-            return None
-
-        async def process_list(usernames, full_match_for_mentor=False):
-            table = []
-            for username in usernames:
-                logger.info("Processing username: %s", username)
-                member = None
-                if full_match_for_mentor and ("#" in username):
-                    member = find_member(username, full_match=True)
-                    if member:
-                        logger.info("Found mentor member (full match): %s", username)
-                    else:
-                        logger.info("Mentor member not found (full match): %s", username)
-                else:
-                    member = find_member(username, full_match=False)
-                    if member:
-                        logger.info("Found member: %s", username)
-                    else:
-                        logger.info("Member not found in guild: %s", username)
-                joined = "Yes" if member else "No"
-                discord_id = str(member.id) if member else "N/A"
-                signed_up = "No"
-                try:
-                    if member:
-                        logger.info("Querying database for member with discord_id: %s", member.id)
-                        row = await self.bot.db_pool.fetchrow(
-                            "SELECT * FROM users WHERE discord_id = $1", str(member.id)
-                        )
-                        logger.info("Database row for member %s: %s", member.id, row)
-                    else:
-                        logger.info("Member not found in guild; falling back to username query for: %s", username)
-                        row = await self.bot.db_pool.fetchrow(
-                            "SELECT * FROM users WHERE discord_username = $1", username
-                        )
-                        logger.info("Database row for username %s: %s", username, row)
-                except Exception as e:
-                    logger.error("Error querying database for %s: %s", member.id if member else username, e)
-                    row = None
-                if row:
-                    signed_up = "Yes"
-                else:
-                    signed_up = "No"
-                table.append((username, discord_id, joined, signed_up))
-            return table
+        index = await self.member_index(guild)
+        approximate = []
+
+        def resolve(roster_entries, full_match_for_mentor=False):
+            resolved = []
+            for username, key in roster_entries:
+                member = index.find(key, full_match=full_match_for_mentor and "#" in key)
+                if member is None:
+                    member = index.closest(key)
+                    if member is not None:
+                        approximate.append(f"{username} -> {member.name}")
+                resolved.append((username, member))
+            return resolved
+
+        roster = self.roster
+        volunteer_entries = resolve(roster.volunteers)
+        mentor_entries = resolve(roster.mentors, full_match_for_mentor=True)
+        entries = volunteer_entries + mentor_entries
+
+        # Members found in the guild are matched by discord_id, the rest fall back to discord_username
+        discord_ids = list({str(member.id) for _, member in entries if member})
+        usernames = list({username for username, member in entries if not member})
+
+        async def fetch_signed_up_ids():
+            # Goes through the shared status cache; any user row counts as signed up
+            try:
+                return set(await self.bot.status_loader.load_many(discord_ids))
+            except Exception as e:
+                logger.error("Error querying database by discord_id: %s", e)
+                return set()
 
-        volunteer_table = await process_list(self.volunteers, full_match_for_mentor=False)
-        mentor_table = await process_list(self.mentors, full_match_for_mentor=True)
+        async def fetch_signed_up_usernames():
+            try:
+                return await self.bot.status_loader.signed_up_usernames(usernames)
+            except Exception as e:
+                logger.error("Error querying database by discord_username: %s", e)
+                return set()
 
-        def create_table(title, rows):
-            header = f"{title}\n"
-            table_header = "| Discord Username         | Discord User ID       | Joined Server | Signed Up on DH |\n"
-            table_divider = "|--------------------------|-----------------------|---------------|----------------|\n"
-            table_rows = ""
-            for r in rows:
-                table_rows += f"| {r[0]:24} | {r[1]:21} | {r[2]:13} | {r[3]:14} |\n"
-            return header + "```" + table_header + table_divider + table_rows + "```"
+        signed_up_ids, signed_up_usernames = await asyncio.gather(
+            fetch_signed_up_ids(),
+            fetch_signed_up_usernames()
+        )
+        logger.info(
+            "Resolved %d roster entries: %d in guild, %d signed up by id, %d signed up by username",
+            len(entries), len(discord_ids), len(signed_up_ids), len(signed_up_usernames)
+        )
 
-        volunteer_text = create_table("Volunteers", volunteer_table)
-        mentor_text = create_table("Mentors", mentor_table)
+        def build_rows(entries):
+            for username, member in entries:
+                if member:
+                    signed_up = str(member.id) in signed_up_ids
+                else:
+                    signed_up = username in signed_up_usernames
+                discord_id = str(member.id) if member else "N/A"
+                joined = "Yes" if member else "No"
+                yield f"| {username:24} | {discord_id:21} | {joined:13} | {'Yes' if signed_up else 'No':14} |"
+
+        def create_table(title, entries):
+            table_header = (
+                "| Discord Username         | Discord User ID       | Joined Server | Signed Up on DH |\n"
+                "|--------------------------|-----------------------|---------------|----------------|\n"
+            )
+            return paginate(build_rows(entries), header=f"{title}\n", block_header=table_header)
 
         logger.info("Sending volunteer table")
-        await ctx.send(volunteer_text)
+        for page in create_table("Volunteers", volunteer_entries):
+            await ctx.send(page)
         logger.info("Sending mentor table")
-        await ctx.send(mentor_text)
+        for page in create_table("Mentors", mentor_entries):
+            await ctx.send(page)
+        if approximate:
+            for page in paginate(approximate, header="Matched approximately, fix these roster entries:\n"):
+                await ctx.send(page)
 
     @commands.command(name="help_saurabh", help="Assign volunteer role to all volunteers and mentor role to all mentors from the config.")
     @commands.has_permissions(administrator=True)
@@ -138,58 +205,77 @@ class Volunteers(commands.Cog):
             await ctx.send("Mentor role not found in this guild.")
             return
 
-        # Helper function: find a member by username.
-        def find_member(name, full_match=False):
-            for member in guild.members:
-                if full_match:
-                    if f"{member.name}#{member.discriminator}" == name:
-                        return member
-                else:
-                    if member.name == name:
-                        return member
-            return None
+        find_member = (await self.member_index(guild)).find
+        roster = self.roster
 
-        assigned_volunteers = 0
+        # Member IDs assigned by an interrupted earlier run, so its work is reported rather than redone
+        checkpoint = Checkpoint(os.path.join(self.jobs_dir, f"help-saurabh-{guild.id}.json"))
+        state = await checkpoint.load()
+        if state:
+            await ctx.send(f"Resuming the previous run, {len(state['volunteer']) + len(state['mentor'])} roles were already assigned.")
+        else:
+            state = {"volunteer": [], "mentor": []}
+
+        # Only members missing their role are queued
+        plan = []
+        already_assigned = 0
         not_found_volunteers = []
-        for username in self.volunteers:
-            member = find_member(username, full_match=False)
-            if member:
-                try:
-                    await member.add_roles(volunteer_role)
-                    logger.info("Assigned volunteer role to %s", username)
-                    assigned_volunteers += 1
-                except Exception as e:
-                    logger.error("Error assigning volunteer role to %s: %s", username, e)
-                
-                # Throttle: wait for 1 second after each role assignment
-                await asyncio.sleep(0.25)
-            else:
-                not_found_volunteers.append(username)
-
-        assigned_mentors = 0
         not_found_mentors = []
-        for username in self.mentors:
-            # For mentors, use a full match if the username includes a '#'
-            if "#" in username:
-                member = find_member(username, full_match=True)
-            else:
-                member = find_member(username, full_match=False)
-            if member:
+        for kind, entries, role, not_found, full_match in (
+            ("volunteer", roster.volunteers, volunteer_role, not_found_volunteers, False),
+            ("mentor", roster.mentors, mentor_role, not_found_mentors, True),
+        ):
+            resumed = set(state[kind])
+            for username, key in entries:
+                # For mentors, use a full match if the username includes a '#'
+                member = find_member(key, full_match=full_match and "#" in key)
+                if member is None:
+                    not_found.append(username)
+                elif member.get_role(role.id) is not None:
+                    already_assigned += member.id not in resumed
+                else:
+                    plan.append((kind, username, member, role))
+
+        status = await ctx.send(f"Assigning roles to {len(plan)} members ({already_assigned} already have theirs)...")
+        failed = []
+        done = 0
+        last_progress = time.monotonic()
+
+        while chunk := plan[done:done + self.bulk_batch_size]:
+            results = await asyncio.gather(*(
+                self.bot.writes.submit(Priority.BULK, member.add_roles, role) for _, _, member, role in chunk
+            ), return_exceptions=True)
+            for (kind, username, member, role), result in zip(chunk, results):
+                if isinstance(result, Exception):
+                    logger.error("Error assigning %s role to %s: %s", kind, username, result)
+                    failed.append(username)
+                else:
+                    logger.info("Assigned %s role to %s", kind, username)
+                    state[kind].append(member.id)
+            done += len(chunk)
+            await checkpoint.save(state)
+
+            if time.monotonic() - last_progress >= self.progress_interval:
+                last_progress = time.monotonic()
                 try:
-                    await member.add_roles(mentor_role)
-                    logger.info("Assigned mentor role to %s", username)
-                    assigned_mentors += 1
-                except Exception as e:
-                    logger.error("Error assigning mentor role to %s: %s", username, e)
-            else:
-                not_found_mentors.append(username)
-
-        response = f"Assigned volunteer role to {assigned_volunteers} volunteers and mentor role to {assigned_mentors} mentors.\n"
+                    await status.edit(content=f"Assigning roles: {done}/{len(plan)} done, {len(failed)} failed...")
+                except discord.HTTPException as e:
+                    logger.warning("Could not update progress message: %s", e)
+
+        await checkpoint.clear()
+        await status.edit(content=f"Assigning roles: {done}/{len(plan)} done, {len(failed)} failed.")
+
+        response = f"Assigned volunteer role to {len(state['volunteer'])} volunteers and mentor role to {len(state['mentor'])} mentors.\n"
+        if already_assigned:
+            response += f"{already_assigned} already had their role.\n"
+        if failed:
+            response += f"Failed, run the command again to retry: {', '.join(failed)}\n"
         if not_found_volunteers:
             response += f"Volunteers not found: {', '.join(not_found_volunteers)}\n"
         if not_found_mentors:
             response += f"Mentors not found: {', '.join(not_found_mentors)}\n"
-        await ctx.send(response)
+        for page in paginate(response.splitlines(), code_block=False):
+            await ctx.send(page)
 
 
 async def setup(bot):
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling through while the breaker is open."""
+
+
+class CircuitBreaker:
+    """Fails fast after repeated errors or timeouts.
+
+    After `failure_threshold` consecutive failures the breaker opens and calls raise
+    CircuitOpenError immediately. Once `reset_timeout` seconds pass, a single trial call
+    is let through: success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=30.0, call_timeout=2.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    async def call(self, func, *args, **kwargs):
+        state = self.state
+        if state == "open" or (state == "half-open" and self.trial_running):
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        self.trial_running = state == "half-open"
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs), self.call_timeout)
+        except Exception:
+            self.record_failure()
+            raise
+        finally:
+            self.trial_running = False
+        self.record_success()
+        return result
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning("%s circuit opened after %s failures", self.name, self.failures)
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("%s circuit closed", self.name)
+        self.failures = 0
+        self.opened_at = None
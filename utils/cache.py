@@ -0,0 +1,52 @@
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class StatusCache:
+    """Bounded LRU cache of discord_id -> status with a TTL per entry.
+
+    A cached None means the user is known not to exist; those entries expire after the much
+    shorter `miss_ttl`, since a row being created or linked sends no invalidation. `generation` increases on every
+    invalidation so batch loaders can tell if a result went stale while in flight.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300.0, miss_ttl=10.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.entries = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, discord_id):
+        """Return the cached status, or MISSING."""
+        entry = self.entries.get(discord_id)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self.entries[discord_id]
+            self.misses += 1
+            return MISSING
+        self.entries.move_to_end(discord_id)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, discord_id, status):
+        ttl = self.ttl if status is not None else self.miss_ttl
+        self.entries[discord_id] = (status, time.monotonic() + ttl)
+        self.entries.move_to_end(discord_id)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, discord_id):
+        self.generation += 1
+        self.entries.pop(discord_id, None)
+
+    def clear(self):
+        self.generation += 1
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,33 @@
+import asyncio
+import json
+import os
+
+
+class Checkpoint:
+    """Small JSON progress file for resumable bulk jobs, replaced atomically on every save."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, data):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    async def load(self):
+        return await asyncio.to_thread(self._read)
+
+    async def save(self, data):
+        await asyncio.to_thread(self._write, data)
+
+    async def clear(self):
+        await asyncio.to_thread(lambda: os.path.exists(self.path) and os.remove(self.path))
@@ -0,0 +1,25 @@
+MESSAGE_LIMIT = 2000
+
+
+def paginate(lines, header="", block_header="", limit=MESSAGE_LIMIT, code_block=True):
+    """Pack lines into as few messages as possible, each under Discord's character limit.
+
+    `header` is repeated above every page, `block_header` at the top of every page's code block.
+    """
+    opening = header + ("```\n" if code_block else "") + block_header
+    closing = "```" if code_block else ""
+    overhead = len(opening) + len(closing)
+    pages = []
+    current = []
+    size = overhead
+    for line in lines:
+        line = line[:limit - overhead - 1]
+        if current and size + len(line) + 1 > limit:
+            pages.append(current)
+            current = []
+            size = overhead
+        current.append(line)
+        size += len(line) + 1
+    if current or not pages:
+        pages.append(current)
+    return [opening + "".join(f"{line}\n" for line in page) + closing for page in pages]
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import time
+from utils.cache import MISSING
+from utils.metrics import pool_acquire_wait, query_duration
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUERY = "SELECT discord_id, status FROM users WHERE discord_id = ANY($1::text[])"
+USERNAME_QUERY = "SELECT discord_username FROM users WHERE discord_username = ANY($1::text[])"
+
+
+class StaleStatusError(Exception):
+    """Raised for fresh_only lookups that could only be answered from the snapshot."""
+
+    def __init__(self, discord_ids):
+        super().__init__(f"Only snapshot statuses available for {len(discord_ids)} users")
+        self.discord_ids = discord_ids
+
+
+class StatusLoader:
+    """Batches users-table status lookups.
+
+    Lookups arriving within `window` seconds of each other are resolved together with a
+    single ANY($1) query, and concurrent lookups for the same discord_id share one result.
+    With a `cache`, hits skip the database entirely and fresh results are stored back.
+    With a `breaker`, queries fail fast while Postgres is unhealthy and are answered from
+    `snapshot` instead; those degraded answers are never cached, and callers that write roles
+    from the result pass `fresh_only` to get StaleStatusError instead.
+    """
+
+    def __init__(self, pool, cache=None, breaker=None, snapshot=None, window=0.005, max_batch=1000):
+        self.pool = pool
+        self.cache = cache
+        self.breaker = breaker
+        self.snapshot = snapshot
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = {}
+        self.flush_handle = None
+        # The loop only keeps weak references to tasks, so in-flight batches are held here
+        self.in_flight = set()
+
+    async def load(self, discord_id, fresh_only=False):
+        """Return the dashboard status for `discord_id`, or None if there is no user.
+
+        With `fresh_only`, raise StaleStatusError rather than return a snapshot answer.
+        """
+        discord_id = str(discord_id)
+        if self.cache is not None:
+            status = self.cache.get(discord_id)
+            if status is not MISSING:
+                return status
+
+        future = self.pending.get(discord_id)
+        if future is None:
+            future = self.pending[discord_id] = asyncio.get_running_loop().create_future()
+            if len(self.pending) >= self.max_batch:
+                self.flush()
+            elif self.flush_handle is None:
+                self.flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush)
+        # Shield so one cancelled caller doesn't cancel the result for everyone sharing it
+        status, fresh = await asyncio.shield(future)
+        if fresh_only and not fresh:
+            raise StaleStatusError([discord_id])
+        return status
+
+    async def load_many(self, discord_ids, fresh_only=False):
+        """Return {discord_id: status} for every id that has a user.
+
+        With `fresh_only`, raise StaleStatusError listing every id that only the snapshot could answer.
+        """
+        discord_ids = list(dict.fromkeys(str(i) for i in discord_ids))
+        statuses = await asyncio.gather(*(self.load(i, fresh_only) for i in discord_ids), return_exceptions=True)
+        stale = [i for i, status in zip(discord_ids, statuses) if isinstance(status, StaleStatusError)]
+        if stale:
+            raise StaleStatusError(stale)
+        for status in statuses:
+            if isinstance(status, BaseException):
+                raise status
+        return {i: status for i, status in zip(discord_ids, statuses) if status is not None}
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.pending:
+            batch, self.pending = self.pending, {}
+            task = asyncio.create_task(self.resolve(batch))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+
+    async def query(self, sql, values):
+        started = time.perf_counter()
+        async with self.pool.acquire() as connection:
+            pool_acquire_wait.observe(time.perf_counter() - started)
+            with query_duration.time("status" if sql == STATUS_QUERY else "username"):
+                return await connection.fetch(sql, values)
+
+    async def guarded(self, sql, values):
+        """Run a read through the breaker. Returns None when Postgres is unavailable and a snapshot can answer."""
+        if self.breaker is None:
+            return await self.query(sql, values)
+        try:
+            return await self.breaker.call(self.query, sql, values)
+        except Exception as e:
+            if self.snapshot is None:
+                raise
+            logger.warning("Users table unavailable (%s: %s), serving from snapshot", type(e).__name__, e)
+            return None
+
+    async def fetch(self, discord_ids):
+        """Return ({discord_id: status}, fresh) where fresh is False for snapshot answers."""
+        rows = await self.guarded(STATUS_QUERY, discord_ids)
+        if rows is None:
+            return await self.snapshot.statuses(discord_ids), False
+        return {row['discord_id']: row['status'] for row in rows}, True
+
+    async def signed_up_usernames(self, usernames):
+        """Return which of `usernames` have a user row."""
+        if not usernames:
+            return set()
+        rows = await self.guarded(USERNAME_QUERY, list(usernames))
+        if rows is None:
+            return await self.snapshot.usernames(usernames)
+        return {row['discord_username'] for row in rows}
+
+    async def resolve(self, batch):
+        generation = self.cache.generation if self.cache is not None else None
+        try:
+            statuses, fresh = await self.fetch(list(batch))
+        except Exception as e:
+            logger.error("Status lookup for %s users failed: %s", len(batch), e)
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # Skip caching if an invalidation arrived while the query was running
+        if fresh and self.cache is not None and self.cache.generation == generation:
+            for discord_id in batch:
+                self.cache.set(discord_id, statuses.get(discord_id))
+        for discord_id, future in batch.items():
+            if not future.done():
+                future.set_result((statuses.get(discord_id), fresh))
@@ -0,0 +1,109 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is emitted as a field
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+_PLAIN = (str, int, float, bool, type(None))
+
+
+def _freeze(value):
+    return value if isinstance(value, _PLAIN) else str(value)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records with message formatting left to the listener thread.
+
+    Arguments that are not plain values (Members, Roles, ...) are converted to strings here,
+    on the calling thread, since the event loop keeps mutating those objects after the call.
+    """
+
+    def prepare(self, record):
+        if isinstance(record.args, dict):
+            record.args = {key: _freeze(value) for key, value in record.args.items()}
+        elif record.args:
+            record.args = tuple(_freeze(value) for value in record.args)
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most `burst` records per message template per `window` seconds.
+
+    Keyed on the unformatted template, so "Assigned role to %s" for thousands of members counts as
+    one message. The next record let through for a template notes how many were dropped before it.
+    Warnings and errors are never limited.
+    """
+
+    def __init__(self, burst=20, window=10.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.counters = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        started, count, dropped = self.counters.get(key, (now, 0, 0))
+        if now - started >= self.window:
+            started, count = now, 0
+        if count >= self.burst:
+            self.counters[key] = (started, count, dropped + 1)
+            return False
+        if dropped:
+            record.suppressed = dropped
+        self.counters[key] = (started, count + 1, 0)
+        return True
+
+
+def setup_logging():
+    """Route all logging through a queue so formatting and I/O happen on a background thread.
+
+    LOG_LEVEL sets the level, LOG_FORMAT picks "json" (default) or "text", and
+    LOG_RATE_BURST / LOG_RATE_WINDOW tune the per-template rate limit.
+    """
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter(
+        burst=int(os.environ.get("LOG_RATE_BURST", "20")),
+        window=float(os.environ.get("LOG_RATE_WINDOW", "10"))
+    ))
+
+    output = logging.StreamHandler()
+    if os.environ.get("LOG_FORMAT", "json") == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,132 @@
+from collections import Counter
+
+import discord
+from utils.roster import normalize, trigrams
+
+
+class MemberIndex:
+    """Lookup table from normalized username and name#discriminator to guild members.
+
+    Names are matched case-insensitively with surrounding whitespace ignored. Members whose
+    names normalize to the same key are all kept, and lookups return the first one added. `closest` finds
+    near misses through a trigram index over the usernames, built the first time it is needed.
+    """
+
+    # Trigrams shared by more names than this are too common to narrow the search
+    MAX_POSTINGS = 2000
+
+    def __init__(self, members=()):
+        self.by_name = {}
+        self.by_full = {}
+        self.by_trigram = None
+        for member in members:
+            self.add(member)
+
+    @staticmethod
+    def full_name(member):
+        return f"{member.name}#{member.discriminator}"
+
+    @staticmethod
+    def _put(table, key, member):
+        """Add or refresh `member` under `key`; returns True if the key is new."""
+        members = table.get(key)
+        if members is None:
+            table[key] = [member]
+            return True
+        for i, existing in enumerate(members):
+            if existing.id == member.id:
+                members[i] = member
+                return False
+        members.append(member)
+        return False
+
+    @staticmethod
+    def _drop(table, key, member):
+        """Remove `member` from `key`; returns True if no member is left under it."""
+        members = table.get(key)
+        if members is None:
+            return False
+        members[:] = [m for m in members if m.id != member.id]
+        if members:
+            return False
+        del table[key]
+        return True
+
+    def _index_trigrams(self, key):
+        for trigram in trigrams(key):
+            self.by_trigram.setdefault(trigram, []).append(key)
+
+    def add(self, member):
+        key = normalize(member.name)
+        if self._put(self.by_name, key, member) and self.by_trigram is not None:
+            self._index_trigrams(key)
+        self._put(self.by_full, normalize(self.full_name(member)), member)
+
+    def remove(self, member):
+        key = normalize(member.name)
+        if self._drop(self.by_name, key, member):
+            for trigram in trigrams(key) if self.by_trigram is not None else ():
+                keys = self.by_trigram[trigram]
+                keys.remove(key)
+                if not keys:
+                    del self.by_trigram[trigram]
+        self._drop(self.by_full, normalize(self.full_name(member)), member)
+
+    def update(self, before, after):
+        if before.name != after.name or before.discriminator != after.discriminator:
+            self.remove(before)
+        self.add(after)
+
+    def find(self, name, full_match=False):
+        table = self.by_full if full_match else self.by_name
+        members = table.get(normalize(name))
+        return members[0] if members else None
+
+    def closest(self, name, threshold=0.5):
+        """The member whose username shares the most trigrams with `name`, if similar enough."""
+        if self.by_trigram is None:
+            self.by_trigram = {}
+            for existing in self.by_name:
+                self._index_trigrams(existing)
+
+        key = normalize(name.split("#", 1)[0])
+        wanted = trigrams(key)
+        hits = Counter()
+        skipped = 0
+        for trigram in wanted:
+            keys = self.by_trigram.get(trigram, ())
+            if len(keys) > self.MAX_POSTINGS:
+                skipped += 1
+            else:
+                hits.update(keys)
+
+        # Similarity can't reach the threshold with fewer shared trigrams than this
+        minimum = threshold * len(wanted) - skipped
+        best, best_score = None, threshold
+        for candidate, counted in hits.items():
+            if counted < minimum:
+                continue
+            # Jaccard similarity of the two trigram sets, counting the common trigrams skipped above
+            other = trigrams(candidate)
+            shared = len(wanted & other)
+            score = shared / (len(wanted) + len(other) - shared)
+            if score >= best_score:
+                best, best_score = candidate, score
+        return self.by_name[best][0] if best is not None else None
+
+
+async def ensure_chunked(guild):
+    """Load the full member list on first use; the bot no longer chunks every guild at startup."""
+    if not guild.chunked:
+        await guild.chunk(cache=True)
+
+
+async def get_or_fetch_member(guild, user_id):
+    """Cached member, falling back to a REST fetch for members not seen since startup."""
+    member = guild.get_member(user_id)
+    if member is None and not guild.chunked:
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return None
+    return member
@@ -0,0 +1,156 @@
+import bisect
+import re
+import time
+from contextlib import contextmanager
+
+import aiohttp
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escape = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    pairs = ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self.values.items():
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+
+class Gauge:
+    """A gauge whose value is read from a callback at scrape time, or set directly."""
+
+    def __init__(self, name, help, callback=None):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {self.callback() if self.callback else self.value}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, value, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        names = self.labels + ("le",)
+        for labels, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {count}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+command_latency = REGISTRY.register(Histogram(
+    "deerhacks_command_seconds", "Command latency from invocation to completion", labels=("command", "outcome")
+))
+pool_acquire_wait = REGISTRY.register(Histogram(
+    "deerhacks_db_pool_acquire_seconds", "Time spent waiting for a database pool connection"
+))
+query_duration = REGISTRY.register(Histogram(
+    "deerhacks_db_query_seconds", "Database query duration", labels=("query",)
+))
+discord_requests = REGISTRY.register(Counter(
+    "deerhacks_discord_requests_total", "Discord REST requests by route and status", labels=("route", "status")
+))
+discord_rate_limits = REGISTRY.register(Counter(
+    "deerhacks_discord_429_total", "Discord REST 429 responses by route", labels=("route",)
+))
+reminder_loop_duration = REGISTRY.register(Histogram(
+    "deerhacks_reminder_loop_seconds", "Duration of one attendance reminder tick"
+))
+reaction_queue_depth = REGISTRY.register(Gauge(
+    "deerhacks_reaction_updates_pending", "Users with a debounced attendance role update waiting"
+))
+write_queue_depth = REGISTRY.register(Gauge(
+    "deerhacks_write_queue_depth", "Discord writes waiting in the scheduler"
+))
+loop_lag = REGISTRY.register(Gauge(
+    "deerhacks_event_loop_lag_seconds", "Most recent event loop scheduling delay"
+))
+
+_SNOWFLAKE = re.compile(r"/\d{15,21}")
+_API_PREFIX = re.compile(r"^/api/v\d+")
+
+
+def route_of(method, path):
+    """Collapse ids and the API version out of a REST path, e.g. PATCH /guilds/{id}/members/{id}."""
+    return f"{method} {_SNOWFLAKE.sub('/{id}', _API_PREFIX.sub('', path))}"
+
+
+def instrument_http(config=None):
+    """Add hooks counting Discord REST responses per route to an aiohttp TraceConfig."""
+    async def on_request_end(session, context, params):
+        route = route_of(params.method, params.url.path)
+        status = params.response.status
+        discord_requests.inc(route, status)
+        if status == 429:
+            discord_rate_limits.inc(route)
+
+    config = config or aiohttp.TraceConfig()
+    config.on_request_end.append(on_request_end)
+    return config
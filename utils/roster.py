@@ -0,0 +1,40 @@
+import json
+import os
+
+
+def normalize(name):
+    """Lookup key for a username: surrounding whitespace trimmed and case folded."""
+    return name.strip().casefold()
+
+
+def trigrams(key):
+    return {key[i:i + 3] for i in range(len(key) - 2)} if len(key) >= 3 else {key}
+
+
+class Roster:
+    """Volunteer and mentor usernames from the roster file, as (name, lookup key) pairs.
+
+    Blank entries are dropped and entries that normalize to the same key are kept once.
+    """
+
+    def __init__(self, volunteers=(), mentors=(), mtime=None):
+        self.volunteers = self._entries(volunteers)
+        self.mentors = self._entries(mentors)
+        self.mtime = mtime
+
+    @staticmethod
+    def _entries(names):
+        entries = {}
+        for name in names:
+            name = name.strip()
+            if name:
+                entries.setdefault(normalize(name), name)
+        return [(name, key) for key, name in entries.items()]
+
+    @classmethod
+    def load(cls, path):
+        """Read the roster file; blocking, so call it through asyncio.to_thread."""
+        mtime = os.path.getmtime(path)
+        with open(path, "r") as f:
+            config = json.load(f)
+        return cls(config.get("volunteers", []), config.get("mentors", []), mtime=mtime)
@@ -0,0 +1,124 @@
+import asyncio
+import itertools
+import logging
+import time
+from enum import IntEnum
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    REACTION = 1
+    BULK = 2
+    REMINDER = 3
+
+
+class WriteScheduler:
+    """Bot-wide queue for Discord writes.
+
+    Writes run in priority order on a fixed number of workers. Pacing between writes
+    backs off on 429s and relaxes again as requests succeed. Only a global rate limit
+    pauses every write; an exhausted per-route bucket (every reaction delete reports one)
+    is left to discord.py's own per-bucket limiter, which holds back just that route.
+    """
+
+    def __init__(self, concurrency=4, min_interval=0.0, max_interval=5.0):
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.paused_until = 0.0
+        self.next_slot = 0.0
+        self.queue = None
+        self.workers = []
+        self.counter = itertools.count()
+
+    def start(self):
+        self.queue = asyncio.PriorityQueue()
+        self.workers = [asyncio.create_task(self.worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        """Stop the workers and cancel every write still waiting, so no submit() caller hangs."""
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        while not self.queue.empty():
+            *_, future = self.queue.get_nowait()
+            future.cancel()
+            self.queue.task_done()
+
+    @property
+    def depth(self):
+        return self.queue.qsize() if self.queue else 0
+
+    async def submit(self, priority, func, *args, **kwargs):
+        """Queue `func(*args, **kwargs)` and wait for its result."""
+        if not self.workers:
+            raise RuntimeError("Write scheduler is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((priority, next(self.counter), func, args, kwargs, future))
+        return await future
+
+    async def wait_for_slot(self):
+        while True:
+            now = time.monotonic()
+            ready_at = max(self.paused_until, self.next_slot)
+            if ready_at <= now:
+                self.next_slot = now + self.interval
+                return
+            await asyncio.sleep(ready_at - now)
+
+    async def worker(self):
+        while True:
+            _, _, func, args, kwargs, future = await self.queue.get()
+            try:
+                if future.cancelled():
+                    continue
+                await self.wait_for_slot()
+                try:
+                    result = await func(*args, **kwargs)
+                except asyncio.CancelledError:
+                    # Stopped mid-write; the caller is told rather than left waiting
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                else:
+                    if not future.cancelled():
+                        future.set_result(result)
+            finally:
+                self.queue.task_done()
+
+    def observe(self, method, status, headers):
+        """Adjust pacing from a REST response's status and rate limit headers."""
+        if method == "GET":
+            return
+        now = time.monotonic()
+        if status == 429:
+            retry_after = float(headers.get("Retry-After", 1))
+            scope = headers.get("X-RateLimit-Scope", "unknown")
+            self.interval = min(self.max_interval, max(self.interval * 2, 0.1))
+            if headers.get("X-RateLimit-Global") == "true" or scope == "global":
+                self.paused_until = max(self.paused_until, now + retry_after)
+                logger.warning("Globally rate limited, pausing writes for %.2fs, interval now %.2fs",
+                               retry_after, self.interval)
+            else:
+                logger.warning("Rate limited on bucket %s (%s scope), interval now %.2fs",
+                               headers.get("X-RateLimit-Bucket", "unknown"), scope, self.interval)
+            return
+        if status < 400:
+            self.interval = max(self.min_interval, self.interval * 0.9)
+
+    def trace_config(self):
+        """aiohttp trace hooks that feed every Discord REST response into `observe`."""
+        async def on_request_end(session, context, params):
+            self.observe(params.method, params.response.status, params.response.headers)
+
+        config = aiohttp.TraceConfig()
+        config.on_request_end.append(on_request_end)
+        return config
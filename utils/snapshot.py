@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    discord_id TEXT PRIMARY KEY,
+    discord_username TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS users_discord_username ON users (discord_username);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# SQLite's default limit on bound parameters is 999
+LOOKUP_CHUNK = 900
+
+
+class StatusSnapshot:
+    """Local SQLite copy of users.discord_id -> status, served while Postgres is unavailable.
+
+    `refresh` copies only rows whose `updated_column` moved past the last seen value, so after
+    the first run each refresh is a small incremental query. Rows deleted upstream are not
+    removed; a snapshot is a fallback, not a source of truth.
+    """
+
+    def __init__(self, path, updated_column="updated_at"):
+        self.path = path
+        self.updated_column = updated_column
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _high_watermark(self):
+        connection = self._connect()
+        try:
+            row = connection.execute("SELECT value FROM meta WHERE key = 'high_watermark'").fetchone()
+        finally:
+            connection.close()
+        return row[0] if row else None
+
+    def _apply(self, rows, high_watermark):
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT INTO users (discord_id, discord_username, status) VALUES (?, ?, ?) "
+                    "ON CONFLICT(discord_id) DO UPDATE SET discord_username = excluded.discord_username, "
+                    "status = excluded.status",
+                    rows
+                )
+                connection.execute(
+                    "INSERT INTO meta (key, value) VALUES ('high_watermark', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (high_watermark,)
+                )
+        finally:
+            connection.close()
+
+    async def refresh(self, connection):
+        """Copy rows changed since the last refresh from a Postgres connection. Returns the row count."""
+        high_watermark = await asyncio.to_thread(self._high_watermark)
+        column = self.updated_column
+        query = (
+            f"SELECT discord_id, discord_username, status, {column}::text AS updated "
+            f"FROM users WHERE discord_id IS NOT NULL"
+        )
+        if high_watermark is None:
+            rows = await connection.fetch(f"{query} ORDER BY {column}")
+        else:
+            # >= so rows sharing the watermark's timestamp are never skipped; re-applying them is harmless
+            rows = await connection.fetch(
+                f"{query} AND {column} >= $1::text::timestamptz ORDER BY {column}", high_watermark
+            )
+        if not rows:
+            return 0
+        # NULLs sort last, so the watermark is the last non-null value; storing NULL would make
+        # every later refresh copy the whole table again
+        updated = next((row['updated'] for row in reversed(rows) if row['updated'] is not None), high_watermark)
+        await asyncio.to_thread(
+            self._apply,
+            [(row['discord_id'], row['discord_username'], row['status']) for row in rows],
+            updated
+        )
+        return len(rows)
+
+    def _lookup(self, column, values):
+        connection = self._connect()
+        try:
+            result = {}
+            for i in range(0, len(values), LOOKUP_CHUNK):
+                chunk = values[i:i + LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                result.update(connection.execute(
+                    f"SELECT {column}, status FROM users WHERE {column} IN ({placeholders})", chunk
+                ))
+        finally:
+            connection.close()
+        return result
+
+    async def statuses(self, discord_ids):
+        return await asyncio.to_thread(self._lookup, "discord_id", list(discord_ids))
+
+    async def usernames(self, usernames):
+        return set(await asyncio.to_thread(self._lookup, "discord_username", list(usernames)))
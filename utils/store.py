@@ -0,0 +1,119 @@
+import asyncio
+import sqlite3
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reminders (
+    member_id INTEGER PRIMARY KEY,
+    guild_id INTEGER,
+    last_reminded REAL,
+    due REAL
+);
+CREATE TABLE IF NOT EXISTS reactions (
+    user_id INTEGER,
+    emoji TEXT,
+    PRIMARY KEY (user_id, emoji)
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _ts(value):
+    return value.timestamp() if value else None
+
+
+def _dt(value):
+    return datetime.fromtimestamp(value) if value is not None else None
+
+
+class StateStore:
+    """SQLite-backed attendance state.
+
+    Writes are queued in memory and applied in a single transaction by `flush`,
+    which runs the SQLite work on a worker thread so the event loop never blocks on disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.reminders = {}
+        self.ops = []
+        self.lock = asyncio.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.executescript(SCHEMA)
+        return connection
+
+    def load(self):
+        """Read the whole store in one pass. Blocking; call through asyncio.to_thread."""
+        connection = self._connect()
+        try:
+            reminders = {
+                member_id: (guild_id, _dt(last_reminded), _dt(due))
+                for member_id, guild_id, last_reminded, due in connection.execute(
+                    "SELECT member_id, guild_id, last_reminded, due FROM reminders"
+                )
+            }
+            reactions = {}
+            for user_id, emoji in connection.execute("SELECT user_id, emoji FROM reactions"):
+                reactions.setdefault(user_id, set()).add(emoji)
+            values = dict(connection.execute("SELECT key, value FROM state"))
+        finally:
+            connection.close()
+        return {"reminders": reminders, "reactions": reactions, "state": values}
+
+    def put_reminder(self, member_id, guild_id, last_reminded, due):
+        # Only the latest write per member matters, so reminders are coalesced by key
+        self.reminders[member_id] = (guild_id, _ts(last_reminded), _ts(due))
+
+    def put_value(self, key, value):
+        self.ops.append((
+            "INSERT INTO state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, None if value is None else str(value))
+        ))
+
+    def add_reaction(self, user_id, emoji):
+        self.ops.append(("INSERT OR IGNORE INTO reactions (user_id, emoji) VALUES (?, ?)", (user_id, emoji)))
+
+    def remove_reaction(self, user_id, emoji):
+        self.ops.append(("DELETE FROM reactions WHERE user_id = ? AND emoji = ?", (user_id, emoji)))
+
+    def clear_reactions(self):
+        self.ops.append(("DELETE FROM reactions", ()))
+
+    @property
+    def dirty(self):
+        return bool(self.reminders or self.ops)
+
+    def _write(self, reminders, ops):
+        connection = self._connect()
+        try:
+            with connection:
+                for sql, params in ops:
+                    connection.execute(sql, params)
+                connection.executemany(
+                    "INSERT INTO reminders (member_id, guild_id, last_reminded, due) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(member_id) DO UPDATE SET guild_id = excluded.guild_id, "
+                    "last_reminded = excluded.last_reminded, due = excluded.due",
+                    [(member_id, *row) for member_id, row in reminders.items()]
+                )
+        finally:
+            connection.close()
+
+    async def flush(self):
+        """Apply all queued writes in one transaction."""
+        async with self.lock:
+            if not self.dirty:
+                return
+            reminders, self.reminders = self.reminders, {}
+            ops, self.ops = self.ops, []
+            try:
+                await asyncio.to_thread(self._write, reminders, ops)
+            except Exception:
+                # Keep the batch for the next flush, behind anything queued meanwhile
+                self.reminders = {**reminders, **self.reminders}
+                self.ops = ops + self.ops
+                raise